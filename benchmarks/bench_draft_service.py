@@ -0,0 +1,141 @@
+"""
+This benchmark measures the latency of the draft service under load.
+It starts the service in a subprocess, sends draft requests from many
+concurrent connections and prints the latency percentiles.
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import numpy as np
+
+
+async def send_request(host, port, body):
+    """
+    Send one HTTP request and wait for the full response.
+
+    Returns:
+        tuple: The HTTP status and the JSON body.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+
+    payload = json.dumps(body).encode("utf-8")
+    writer.write(
+        (
+            "POST /draft HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("latin-1")
+        + payload
+    )
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+
+    head, _, content = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+
+    return status, json.loads(content)
+
+
+async def run_load(host, port, number_of_requests, concurrency, body, seeds=None):
+    """
+    Send requests from a number of concurrent clients.
+    With seeds the requests cycle over that many seeds, so repeated drafts
+    come from the draft cache.
+
+    Returns:
+        numpy.ndarray: The latency of every request in milliseconds.
+    """
+    latencies = []
+    next_request = iter(range(number_of_requests))
+
+    async def client():
+        for request_number in next_request:
+            start_time = time.perf_counter()
+            status, content = await send_request(
+                host,
+                port,
+                {**body, "seed": request_number % (seeds or number_of_requests)},
+            )
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            if status != 200:
+                raise RuntimeError(f"Request failed with {status}: {content}")
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    return np.array(latencies)
+
+
+async def wait_for_service(host, port, timeout=60):
+    """
+    Wait until the service accepts connections.
+    """
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+
+    raise RuntimeError("The draft service did not start")
+
+
+def main():
+    """
+    Command line entry point for the draft service benchmark.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the draft service.")
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--mode", default="random")
+    parser.add_argument(
+        "--seeds", type=int, default=None, help="Number of distinct seeds to cycle."
+    )
+    args = parser.parse_args()
+
+    host = "127.0.0.1"
+    command = [
+        sys.executable,
+        "-m",
+        "my_project.draft_service",
+        "--port",
+        str(args.port),
+    ]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+
+    with subprocess.Popen(command, stdout=subprocess.DEVNULL) as service:
+        try:
+            asyncio.run(wait_for_service(host, args.port))
+
+            body = {"mode": args.mode}
+            start_time = time.perf_counter()
+            latencies = asyncio.run(
+                run_load(
+                    host, args.port, args.requests, args.concurrency, body, args.seeds
+                )
+            )
+            elapsed = time.perf_counter() - start_time
+        finally:
+            service.terminate()
+
+    print(f"Requests: {args.requests}, concurrency: {args.concurrency}")
+    print(f"Throughput: {args.requests / elapsed:.0f} drafts/s")
+    for percentile in [50, 90, 99]:
+        print(f"p{percentile}: {np.percentile(latencies, percentile):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
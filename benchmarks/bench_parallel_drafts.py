@@ -0,0 +1,90 @@
+"""
+This benchmark measures how batch draft generation scales with the number of
+pool workers. It prints the drafts per second and the speedup for every worker
+count, and checks that every worker count gives the same drafts.
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+from my_project.create_batch_drafts import generate_drafts
+from my_project.create_super_league import get_file_path
+from my_project.create_super_league import get_position_slots
+from my_project.create_super_league import set_criteria
+from my_project.dataset_cache import load_players
+from my_project.position_index import get_player_ids
+from my_project.position_index import get_position_index
+
+
+def benchmark_workers(number_of_drafts, worker_counts, seed=0):
+    """
+    Time the same batch for every worker count and print the speedup curve.
+    """
+    set_criteria()
+
+    file_path = get_file_path()
+    datafile = load_players(file_path)
+    position_slots = get_position_slots(datafile)
+    position_index = get_position_index(file_path, datafile)
+    player_ids = get_player_ids(datafile)
+    overall = datafile["Overall"].to_numpy(dtype=np.int32)
+    entropy = np.random.SeedSequence(seed).entropy
+
+    print(f"{'Workers':>8} {'Seconds':>10} {'Drafts/s':>12} {'Speedup':>9}")
+
+    reference_drafts = None
+    reference_time = None
+
+    for workers in worker_counts:
+        start_time = time.perf_counter()
+        drafts = generate_drafts(
+            position_index,
+            position_slots,
+            player_ids,
+            overall,
+            number_of_drafts,
+            entropy,
+            workers,
+        )
+        elapsed = time.perf_counter() - start_time
+
+        # Every worker count must give exactly the same drafts
+        if reference_drafts is None:
+            reference_drafts = drafts
+            reference_time = elapsed
+        elif not np.array_equal(drafts, reference_drafts):
+            raise RuntimeError(
+                f"Drafts with {workers} workers differ from the first run"
+            )
+
+        speedup = reference_time / elapsed
+        print(
+            f"{workers:>8} {elapsed:>10.2f} {number_of_drafts / elapsed:>12.0f} "
+            f"{speedup:>9.2f}"
+        )
+
+
+def main():
+    """
+    Command line entry point for the parallel draft benchmark.
+    """
+    default_workers = [1, 2, 4, 8, 16]
+    cpu_count = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description="Benchmark parallel draft batches.")
+    parser.add_argument("-n", "--drafts", type=int, default=20000)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[count for count in default_workers if count <= cpu_count],
+    )
+    args = parser.parse_args()
+
+    benchmark_workers(args.drafts, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+This benchmark suite measures the stages of the draft pipeline on the bundled
+dataset and on synthetic datasets that are 10 and 100 times larger.
+For every stage it reports the wall time, how far the RSS grew while the stage
+ran and the memory it allocated, and it compares the results with a saved JSON
+baseline.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from my_project.analytics import compute_player_analytics
+from my_project.balance_teams import balance_tiers
+from my_project.create_batch_drafts import generate_drafts
+from my_project.create_players import create_availability
+from my_project.create_players import draft_all_positions
+from my_project.create_players import draft_position
+from my_project.create_super_league import create_csv_file
+from my_project.create_super_league import criteria
+from my_project.create_super_league import get_file_path
+from my_project.create_super_league import get_position_columns
+from my_project.create_super_league import get_position_slots
+from my_project.create_super_league import set_criteria
+from my_project.dataset_cache import load_players
+from my_project.draft_board import save_draft
+from my_project.position_index import get_player_ids
+from my_project.position_index import get_position_index
+from my_project.scoring import ATTRIBUTE_COLUMNS
+from my_project.scoring import get_attribute_matrix
+from my_project.scoring import get_weight_matrix
+from my_project.scoring import load_score_profile
+from my_project.settings import get_settings
+from my_project.settings import override_settings
+
+BASELINE_PATH = os.path.join("benchmarks", "baselines", "baseline.json")
+
+# Columns of the synthetic datasets
+SYNTHETIC_COLUMNS = ["Name", "Nation", "Club", "Position", "Age", "Overall"]
+
+
+def run_benchmarks(scales, repeat, work_dir):
+    """
+    Run all stages for every dataset scale.
+
+    Returns:
+        dict: Results per scale and stage.
+    """
+    set_criteria()
+
+    # Keep the cache and draft output of the benchmark out of the project
+    override_settings(
+        cache_path=os.path.join(work_dir, "cache"),
+        leagues_path=os.path.join(work_dir, "leagues"),
+    )
+
+    source_path = os.path.join(
+        get_settings()["original_dataset_path"], "male_players.csv"
+    )
+
+    results = {}
+    for scale in scales:
+        if scale == 1:
+            file_path = source_path
+        else:
+            file_path = create_synthetic_dataset(source_path, scale, work_dir)
+
+        print(f"\nDataset x{scale}: {file_path}")
+        results[f"x{scale}"] = benchmark_dataset(file_path, repeat)
+
+    return results
+
+
+def create_synthetic_dataset(source_path, scale, work_dir):
+    """
+    Create a synthetic dataset by repeating the source players, with
+    renamed copies and slightly changed ratings.
+
+    Returns:
+        str: The path to the synthetic CSV file.
+    """
+    rng = np.random.default_rng(scale)
+    source = pd.read_csv(source_path, usecols=SYNTHETIC_COLUMNS)[SYNTHETIC_COLUMNS]
+
+    copies = []
+    for copy_number in range(scale):
+        copy = source.copy()
+        copy["Name"] = copy["Name"] + f" {copy_number}"
+        jitter = rng.integers(-2, 3, size=len(copy))
+        copy["Overall"] = np.clip(copy["Overall"] + jitter, 40, 99)
+        copies.append(copy)
+
+    file_path = os.path.join(work_dir, f"synthetic_players_x{scale}.csv")
+    pd.concat(copies, ignore_index=True).to_csv(file_path, index=False)
+
+    return file_path
+
+
+def benchmark_dataset(file_path, repeat):
+    """
+    Benchmark every stage of the pipeline on one dataset.
+    """
+    datafile = load_players(file_path)
+    position_index = get_position_index(file_path, datafile)
+    player_ids = get_player_ids(datafile)
+    overall = datafile["Overall"].to_numpy(dtype=np.int32)
+    position_slots = get_position_slots(datafile)
+    unique_positions = get_position_columns(position_slots)
+    cb_columns = (unique_positions.index("CB1"), 2)
+
+    def read_csv_stage():
+        get_file_path()
+        pd.read_csv(file_path)
+
+    def player_draft_stage():
+        rng = np.random.default_rng(0)
+        draft_board = create_csv_file(position_slots)
+        draft_board["dataset"] = file_path
+        draft_all_positions(
+            position_index,
+            position_slots,
+            criteria,
+            draft_board["players"],
+            rng,
+            player_ids,
+        )
+        save_draft(draft_board)
+
+    def cb_draft_stage():
+        rng = np.random.default_rng(0)
+        players = create_csv_file(position_slots)["players"]
+        availability = (player_ids, create_availability(player_ids))
+        draft_position(
+            position_index["CB"], criteria, cb_columns, players, rng, availability
+        )
+
+    def batch_draft_stage():
+        generate_drafts(position_index, position_slots, player_ids, overall, 1000, 0)
+
+    def score_stage():
+        # All attributes, to time the full matrix multiply without the cache
+        attributes = ["Overall"] + ATTRIBUTE_COLUMNS
+        profile = load_score_profile("ball-playing")
+        positions = sorted(position_index)
+        return get_attribute_matrix(datafile, attributes) @ get_weight_matrix(
+            profile, attributes, positions
+        )
+
+    def balance_stage():
+        rng = np.random.default_rng(0)
+        players = create_csv_file(position_slots)["players"]
+        draft_all_positions(
+            position_index, position_slots, criteria, players, rng, player_ids
+        )
+        balance_tiers(players, overall, criteria, rng)
+
+    stages = {
+        "get_file_path+read_csv": read_csv_stage,
+        "load_players (cached)": lambda: load_players(file_path),
+        "create_player_draft": player_draft_stage,
+        "draft_position (CB x2)": cb_draft_stage,
+        "balance_tiers": balance_stage,
+        "analyze_players": lambda: compute_player_analytics(datafile),
+        "batch_drafts_1000": batch_draft_stage,
+    }
+
+    # Datasets created before the attributes were kept can't be scored
+    if set(ATTRIBUTE_COLUMNS) <= set(datafile.columns):
+        stages["score_players (35 cols)"] = score_stage
+
+    print(
+        f"{'Stage':<26} {'Seconds':>10} {'RSS +MB':>12} "
+        f"{'Alloc MB':>10} {'New blocks':>12}"
+    )
+
+    results = {}
+    for name, stage in stages.items():
+        results[name] = measure_stage(stage, repeat)
+        print(
+            f"{name:<26} {results[name]['seconds']:>10.4f} "
+            f"{results[name]['peak_rss_mb']:>12.1f} "
+            f"{results[name]['peak_alloc_mb']:>10.2f} "
+            f"{results[name]['new_blocks']:>12}"
+        )
+
+    return results
+
+
+def measure_stage(stage, repeat):
+    """
+    Measure one stage: the best wall time of several runs, and the memory of
+    one extra run in a forked child process (see measure_stage_memory), so
+    every stage starts from the same process and its peak RSS is its own.
+    """
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - start_time)
+
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    child = context.Process(target=measure_stage_memory, args=(stage, sender))
+    child.start()
+    sender.close()
+    memory = receiver.recv()
+    child.join()
+
+    return {"seconds": min(times), **memory}
+
+
+def measure_stage_memory(stage, sender):
+    """
+    Run a stage once in a forked child and send its memory use to the parent:
+    how far the RSS grew over the RSS at the start of the stage, the peak
+    memory traced by tracemalloc, and the blocks the stage allocated and kept
+    (the difference between a tracemalloc snapshot before and after it).
+    """
+    start_rss_kb = get_current_rss_kb()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    stage()
+    after = tracemalloc.take_snapshot()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    new_blocks = sum(
+        max(statistic.count_diff, 0) for statistic in after.compare_to(before, "lineno")
+    )
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    sender.send(
+        {
+            "peak_rss_mb": max(peak_rss_kb - start_rss_kb, 0) / 1024,
+            "peak_alloc_mb": peak_bytes / (1024 * 1024),
+            "new_blocks": new_blocks,
+        }
+    )
+    sender.close()
+
+
+def get_current_rss_kb():
+    """
+    Get the current RSS of the process in kilobytes, from /proc on Linux;
+    elsewhere the peak RSS so far is the closest measure.
+    """
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Compare the results with a baseline.
+
+    Returns:
+        list: Descriptions of every metric that got worse than the threshold allows.
+    """
+    regressions = []
+
+    for scale, stages in results.items():
+        for name, metrics in stages.items():
+            baseline_metrics = baseline.get(scale, {}).get(name)
+            if baseline_metrics is None:
+                continue
+
+            for metric in ["seconds", "peak_alloc_mb"]:
+                limit = baseline_metrics[metric] * (1 + threshold)
+                if metrics[metric] > limit:
+                    regressions.append(
+                        f"{scale} {name} {metric}: {metrics[metric]:.4f} "
+                        f"> {limit:.4f} (baseline {baseline_metrics[metric]:.4f})"
+                    )
+
+    return regressions
+
+
+def main():
+    """
+    Command line entry point for the benchmark suite.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the draft pipeline.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown before a stage counts as a regression (0.25 = 25%%).",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(args.scales, args.repeat, work_dir)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"\nBaseline saved at: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}, run with --save-baseline first.")
+        return
+
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print("\nPerformance regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+    print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,328 @@
 """
 main.py
 
-This script serves as the entry point for the EA FC Team Generator Tool. 
-It controls the execution flow of the tool based on predefined flags 
-and prints a banner to welcome users.
+This script serves as the entry point for the EA FC Team Generator Tool.
+Every part of the tool is a subcommand, and the modules of a subcommand
+(with pandas and NumPy) are only imported when that subcommand runs,
+so --help and argument errors return right away.
+
+    python main.py dataset
+    python main.py analyze
+    python main.py draft --seed 42
+    python main.py batch --drafts 10000 --workers 4
+    python main.py serve --port 8765
+    python main.py simulate --seasons 1000
+    python main.py check --drafts 1000
 """
 
-from my_project.analytics import analyze_male_players as analyze
-from my_project.create_own_dataset import create_male_dataset as create
-from my_project.create_super_league import create_draft as draft
+# The modules of a subcommand are imported inside its run function on purpose
+# pylint: disable=import-outside-toplevel
+
+import argparse
 
 
-def main():
+def main(argv=None):
     """
     Main function to run the EA FC Team Generator Tool.
-    Controls the flow of the script based on flags.
+    Without a subcommand a draft is created, as before.
     """
+    parser = create_parser()
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        args = parser.parse_args(["draft"])
+
     print_banner()
+    args.run(args)
+
+
+def create_parser():
+    """
+    Create the argument parser with a subparser for every part of the tool.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="EA FC Team Generator Tool."
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    dataset_parser = subparsers.add_parser(
+        "dataset", help="Create the edited dataset from the original dataset."
+    )
+    dataset_parser.add_argument(
+        "--female", action="store_true", help="Create the female dataset."
+    )
+    dataset_parser.add_argument(
+        "--pool",
+        action="store_true",
+        help="Create the player pool of all sources in the player pool config.",
+    )
+    dataset_parser.add_argument(
+        "--sources",
+        nargs="+",
+        default=None,
+        help="Source files in the original dataset directory to merge.",
+    )
+    dataset_parser.set_defaults(run=run_dataset)
+
+    analyze_parser = subparsers.add_parser(
+        "analyze", help="Show analytics of the players or of drafts."
+    )
+    analyze_parser.add_argument(
+        "--drafts",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="BATCH_FILE",
+        help="Analyse the balance of a batch file, or of the last draft.",
+    )
+    analyze_parser.set_defaults(run=run_analyze)
+
+    draft_parser = subparsers.add_parser("draft", help="Create a draft.")
+    add_draft_arguments(draft_parser)
+    draft_parser.set_defaults(run=run_draft)
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Create a batch of seeded drafts."
+    )
+    add_draft_arguments(batch_parser)
+    batch_parser.add_argument("-n", "--drafts", type=positive_int, default=1000)
+    batch_parser.add_argument("--output", default=None)
+    batch_parser.add_argument("-w", "--workers", type=positive_int, default=1)
+    batch_parser.add_argument(
+        "--archive", default=None, help="Append the drafts to a draft archive."
+    )
+    batch_parser.set_defaults(run=run_batch)
+
+    redraft_parser = subparsers.add_parser(
+        "redraft", help="Re-draft one position, team or tier of the last draft."
+    )
+    redraft_parser.add_argument("part", choices=["position", "team", "tier"])
+    redraft_parser.add_argument(
+        "name", help="Position (such as CB), team or tier name."
+    )
+    redraft_parser.add_argument("--seed", type=int, default=None)
+    redraft_parser.add_argument("--no-export", action="store_true")
+    redraft_parser.set_defaults(run=run_redraft)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve drafts over local HTTP or a Unix socket."
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument(
+        "--unix", default=None, help="Serve on a Unix socket path."
+    )
+    serve_parser.add_argument("-w", "--workers", type=positive_int, default=None)
+    serve_parser.set_defaults(run=run_serve)
+
+    simulate_parser = subparsers.add_parser(
+        "simulate", help="Simulate seasons of the leagues of the last draft."
+    )
+    simulate_parser.add_argument("-n", "--seasons", type=positive_int, default=1000)
+    simulate_parser.add_argument(
+        "--years",
+        type=positive_int,
+        default=1,
+        help="Seasons per run, with promotions.",
+    )
+    simulate_parser.add_argument("--seed", type=int, default=None)
+    simulate_parser.add_argument(
+        "--spots", type=int, default=3, help="Teams promoted and relegated."
+    )
+    simulate_parser.add_argument("--no-export", action="store_true")
+    simulate_parser.set_defaults(run=run_simulate)
+
+    archive_parser = subparsers.add_parser(
+        "archive", help="Show or search the drafts of a draft archive."
+    )
+    archive_parser.add_argument("action", choices=["info", "show", "find"])
+    archive_parser.add_argument("archive")
+    archive_parser.add_argument("draft_id", nargs="?", type=int, default=None)
+    archive_parser.add_argument("--team", default=None)
+    archive_parser.add_argument("--min", type=float, default=None)
+    archive_parser.add_argument("--max", type=float, default=None)
+    archive_parser.set_defaults(run=run_archive)
+
+    check_parser = subparsers.add_parser(
+        "check", help="Check the draft invariants on many seeded drafts."
+    )
+    check_parser.add_argument("-n", "--drafts", type=positive_int, default=1000)
+    check_parser.add_argument("--seed", type=int, default=None)
+    check_parser.add_argument("-w", "--workers", type=positive_int, default=1)
+    add_league_arguments(check_parser)
+    check_parser.add_argument(
+        "--synthetic-only",
+        action="store_true",
+        help="Only check the synthetic datasets.",
+    )
+    check_parser.set_defaults(run=run_check)
+
+    return parser
+
+
+def add_draft_arguments(parser):
+    """
+    Add the arguments shared by the draft and batch subcommands.
+    """
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--mode", choices=["random", "balanced"], default=None)
+    add_league_arguments(parser)
+
+
+def add_league_arguments(parser):
+    """
+    Add the arguments that choose the leagues, formation and players to draft.
+    """
+    parser.add_argument("--structure", default=None, help="League structure name.")
+    parser.add_argument("--formation", default=None, help="Formation name.")
+    parser.add_argument(
+        "--pool", default=None, help='Player filter, such as "gender=F;season=FC24".'
+    )
+    parser.add_argument(
+        "--score", default=None, help="Score profile to rank the players by."
+    )
+
+
+def positive_int(value):
+    """
+    Parse an argument that counts something at least once.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+
+    return number
+
+
+def run_dataset(args):
+    """
+    Create the edited male or female dataset, or the player pool.
+    """
+    from my_project.create_own_dataset import create_female_dataset
+    from my_project.create_own_dataset import create_male_dataset
+    from my_project.create_own_dataset import create_player_pool
+
+    if args.pool:
+        create_player_pool()
+        return
+
+    create = create_female_dataset if args.female else create_male_dataset
+    create(args.sources)
+
 
-    # Flags to control which parts of the tool are run
-    make_male_dataset = False
-    show_analytics = False
-    start_draft = True
+def run_analyze(args):
+    """
+    Show the player analytics, or the balance of drafts.
+    """
+    if args.drafts is None:
+        from my_project.analytics import analyze_male_players
+
+        analyze_male_players()
+    else:
+        from my_project.draft_analytics import analyze_drafts
+
+        analyze_drafts(args.drafts or None)
+
+
+def run_draft(args):
+    """
+    Create a draft.
+    """
+    from my_project.create_super_league import create_draft
+
+    create_draft(
+        args.seed, args.structure, args.formation, args.mode, args.pool, args.score
+    )
+
+
+def run_batch(args):
+    """
+    Create a batch of drafts.
+    """
+    from my_project.create_batch_drafts import create_drafts
+
+    create_drafts(
+        args.drafts,
+        args.seed,
+        args.output,
+        args.workers,
+        args.structure,
+        args.formation,
+        args.mode,
+        args.pool,
+        args.score,
+        args.archive,
+    )
+
+
+def run_redraft(args):
+    """
+    Re-draft part of the last draft.
+    """
+    from my_project import redraft
+
+    redraft_part = {
+        "position": redraft.redraft_position,
+        "team": redraft.redraft_team,
+        "tier": redraft.redraft_tier,
+    }[args.part]
+    redraft_part(args.name, args.seed, export=not args.no_export)
 
-    # Create the dataset if the flag is set
-    if make_male_dataset:
-        create()
 
-    # Show analytics if the flag is set
-    if show_analytics:
-        analyze()
+def run_serve(args):
+    """
+    Run the draft service until it is stopped.
+    """
+    import asyncio
+
+    from my_project.draft_service import serve
+
+    asyncio.run(serve(args.host, args.port, args.unix, args.workers))
+
+
+def run_simulate(args):
+    """
+    Simulate seasons of the last draft.
+    """
+    from my_project.simulate_seasons import simulate_seasons
+
+    simulate_seasons(
+        args.seasons, args.years, args.seed, args.spots, export=not args.no_export
+    )
+
+
+def run_archive(args):
+    """
+    Show or search the drafts of a draft archive.
+    """
+    from my_project.draft_archive import show_archive
+
+    show_archive(
+        args.archive, args.action, args.draft_id, args.team, args.min, args.max
+    )
+
+
+def run_check(args):
+    """
+    Check the draft invariants, and exit with an error when one fails.
+    """
+    from my_project.draft_invariants import check_invariants
+
+    results = check_invariants(
+        args.drafts,
+        args.seed,
+        args.workers,
+        args.structure,
+        args.formation,
+        args.pool,
+        args.score,
+        args.synthetic_only,
+    )
 
-    # Start the draft if the flag is set
-    if start_draft:
-        draft()
+    if any(
+        len(numbers) for failures in results.values() for numbers in failures.values()
+    ):
+        raise SystemExit(1)
 
 
 def print_banner():
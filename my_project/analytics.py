@@ -1,12 +1,24 @@
 """
 This module performs analysis on a dataset of male players.
 It provides statistics such as total number of players, distribution of overall ratings,
-and distribution of player positions.
+and distribution of player positions, nations, clubs and ages.
 """
 
-from dotenv import load_dotenv
+import numpy as np
 import pandas as pd
 from .create_super_league import get_file_path
+from .dataset_cache import load_players
+
+# Lower bounds of the rating bands, the last band has no upper bound
+RATING_BANDS = {"Below 70": 0, "70-79": 70, "80-89": 80, "90+": 90}
+
+# Define position categories
+POSITION_GROUPS = {
+    "Goalkeepers": ["GK"],
+    "Defenders": ["CB", "LB", "RB", "LWB", "RWB"],
+    "Midfielders": ["CM", "CDM", "CAM", "RM", "LM"],
+    "Strikers": ["ST", "CF", "RW", "LW"],
+}
 
 
 def analyze_male_players():
@@ -18,55 +30,115 @@ def analyze_male_players():
     - Total number of male players
     - Distribution of players by overall rating (90+, 80-89, 70-79)
     - Distribution of players by position (Goalkeepers, Defenders, Midfielders, Strikers)
+    - The nations and clubs with the most players
+
+    Returns:
+        dict: The analytics computed by compute_player_analytics.
     """
     # Print Banner
     print_banner_analytics()
 
-    # Load the environment variables
-    load_dotenv()
-
     # Load the dataset
     file_path = get_file_path()
-    datafile = pd.read_csv(file_path)
+    datafile = load_players(file_path)
 
     # Perform analysis
-    total_male_players = len(datafile)
-    players_with_90_overall = len(datafile[datafile["Overall"] >= 90])
-    players_with_80_overall = len(
-        datafile[(datafile["Overall"] >= 80) & (datafile["Overall"] < 90)]
-    )
-    players_with_70_overall = len(
-        datafile[(datafile["Overall"] >= 70) & (datafile["Overall"] < 80)]
-    )
+    analytics = compute_player_analytics(datafile)
+    rating_bands = analytics["rating_bands"]
+    position_groups = analytics["position_groups"]
+
+    # Print results
+    print(f"Total number of male players: {analytics['total_players']}\n")
+
+    print("Overall rating distribution:")
+    print(f"Players with rating of 90 or higher: {rating_bands['90+']}")
+    print(f"Players with rating between 80 and 89: {rating_bands['80-89']}")
+    print(f"Players with rating of between 70 and 79: {rating_bands['70-79']}\n")
+
+    print("Overall position distribution:")
+    print(f"Goalkeepers: {position_groups['Goalkeepers']}")
+    print(f"Defenders: {position_groups['Defenders']}")
+    print(f"Midfielders: {position_groups['Midfielders']}")
+    print(f"Strikers: {position_groups['Strikers']}\n")
+
+    print("Nations with the most players:")
+    for nation, count in analytics["nations"].head(5).items():
+        print(f"{nation}: {count}")
+
+    print("\nClubs with the most players:")
+    for club, count in analytics["clubs"].head(5).items():
+        print(f"{club}: {count}")
 
-    # Define position categories
-    # Goalkeepers: GK
-    # Defenders: CB, LB, RB, LWB, RWB
-    # Midfielders: CM, CDM, CAM, RM, LM
-    # Strikers: ST, CF, RW, LW
+    return analytics
 
-    goalkeepers_count = len(datafile[datafile["Position"] == "GK"])
-    defenders_count = len(
-        datafile[datafile["Position"].isin(["CB", "LB", "RB", "LWB", "RWB"])]
+
+def compute_player_analytics(datafile):
+    """
+    Compute the distributions of a player dataset.
+    Every distribution is one bincount over integer codes, so the dataset is
+    scanned once per column instead of once per band or group.
+
+    Returns:
+        dict: With the keys
+            - total_players: Number of players
+            - rating_bands: Players per rating band
+            - position_groups: Players per position group
+            - positions: Players per position
+            - nations: Players per nation, most players first
+            - clubs: Players per club, most players first
+            - ages: Players per age
+    """
+    overall = datafile["Overall"].to_numpy()
+
+    # Rating bands
+    band_codes = pd.cut(
+        overall,
+        bins=list(RATING_BANDS.values()) + [np.inf],
+        right=False,
+        labels=False,
     )
-    midfielders_count = len(
-        datafile[datafile["Position"].isin(["CM", "CDM", "CAM", "RM", "LM"])]
+    band_counts = np.bincount(
+        band_codes[~np.isnan(band_codes)].astype(np.intp), minlength=len(RATING_BANDS)
     )
-    strikers_count = len(datafile[datafile["Position"].isin(["ST", "CF", "RW", "LW"])])
+    rating_bands = pd.Series(band_counts, index=list(RATING_BANDS))
+
+    # Positions and position groups
+    positions = count_categories(datafile["Position"])
+    group_counts = {
+        group: int(positions.reindex(group_positions, fill_value=0).sum())
+        for group, group_positions in POSITION_GROUPS.items()
+    }
+
+    # Ages
+    ages = datafile["Age"].to_numpy()
+    age_counts = np.bincount(ages.astype(np.intp))
+    present_ages = np.flatnonzero(age_counts)
+
+    return {
+        "total_players": len(datafile),
+        "rating_bands": rating_bands,
+        "position_groups": pd.Series(group_counts),
+        "positions": positions,
+        "nations": count_categories(datafile["Nation"]).sort_values(ascending=False),
+        "clubs": count_categories(datafile["Club"]).sort_values(ascending=False),
+        "ages": pd.Series(age_counts[present_ages], index=present_ages),
+    }
+
+
+def count_categories(column):
+    """
+    Count the players per value of a text column with one bincount over its category codes.
 
-    # Print results
-    print(f"Total number of male players: {total_male_players}\n")
+    Returns:
+        pandas.Series: Number of players per value, values without players left out.
+    """
+    categorical = pd.Categorical(column)
+    codes = categorical.codes
 
-    print("Overall rating distribution:")
-    print(f"Players with rating of 90 or higher: {players_with_90_overall}")
-    print(f"Players with rating between 80 and 89: {players_with_80_overall}")
-    print(f"Players with rating of between 70 and 79: {players_with_70_overall}\n")
+    counts = np.bincount(codes[codes >= 0], minlength=len(categorical.categories))
+    counts = pd.Series(counts, index=categorical.categories)
 
-    print("Overall position distribution:")
-    print(f"Goalkeepers: {goalkeepers_count}")
-    print(f"Defenders: {defenders_count}")
-    print(f"Midfielders: {midfielders_count}")
-    print(f"Strikers: {strikers_count}")
+    return counts[counts > 0]
 
 
 def print_banner_analytics():
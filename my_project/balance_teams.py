@@ -0,0 +1,137 @@
+"""
+This module handles the balanced draft mode.
+After the players of every tier are drafted, the players of each position slot
+are reassigned to the teams of the tier so that the team averages of the tier
+are as equal as possible. Who goes where is still random: teams and players
+with the same strength are ordered at random.
+"""
+
+import numpy as np
+from .create_players import get_tier_rows
+from .instrumentation import add_counts
+from .instrumentation import trace_stage
+
+# Passes over all position slots after the first assignment
+MAX_PASSES = 10
+
+
+def balance_tiers(players, overall, criteria, rng):
+    """
+    Balance the teams of every tier of a draft board in place.
+    The players of a tier stay in the tier and in their position slot,
+    only the team they play for changes.
+    """
+    with trace_stage("balance_tiers") as counters:
+        for start, number_of_teams in get_tier_rows(criteria):
+            block = players[start : start + number_of_teams]
+            passes = balance_block(block, overall, rng)
+            add_counts(counters, rows=number_of_teams, passes=passes)
+
+
+def balance_block(block, overall, rng, max_passes=MAX_PASSES):
+    """
+    Balance the teams of one tier in place, minimizing the variance of the team
+    totals (and so of the team averages, as every team has the same slots).
+
+    Every step assigns the players of one slot to the teams, given the totals of
+    the other slots. With the cost (team total + player rating) squared this
+    assignment problem is a Monge array, so the exact optimum is the anti-sorted
+    matching: the strongest player goes to the weakest team. The first pass
+    assigns the slots with the widest spread of ratings first; later passes
+    reassign every slot until the variance stops going down.
+
+    Returns:
+        int: The number of passes made.
+    """
+    number_of_teams, number_of_slots = block.shape
+    if number_of_teams < 2:
+        return 0
+
+    ratings = get_block_ratings(block, overall)
+    totals = np.zeros(number_of_teams)
+    slot_order = np.argsort(-ratings.std(axis=0), kind="stable")
+
+    for slot in slot_order:
+        assign_slot(block, ratings, totals, slot, rng)
+        totals += ratings[:, slot]
+
+    passes = 1
+    variance = totals.var()
+
+    while passes < max_passes and variance > 0:
+        for slot in rng.permutation(number_of_slots):
+            totals -= ratings[:, slot]
+            assign_slot(block, ratings, totals, slot, rng)
+            totals += ratings[:, slot]
+
+        passes += 1
+        new_variance = totals.var()
+        if new_variance >= variance - 1e-9:
+            break
+        variance = new_variance
+
+    return passes
+
+
+def balance_slots(block, overall, slots, rng, max_passes=MAX_PASSES):
+    """
+    Balance the teams of one tier in place by reassigning only the given slots,
+    the other slots keep their players.
+
+    Returns:
+        int: The number of passes made.
+    """
+    number_of_teams = len(block)
+    if number_of_teams < 2:
+        return 0
+
+    ratings = get_block_ratings(block, overall)
+    totals = ratings.sum(axis=1)
+
+    passes = 0
+    variance = totals.var()
+
+    while passes < max_passes and variance > 0:
+        for slot in slots:
+            totals -= ratings[:, slot]
+            assign_slot(block, ratings, totals, slot, rng)
+            totals += ratings[:, slot]
+
+        passes += 1
+        new_variance = totals.var()
+        if new_variance >= variance - 1e-9:
+            break
+        variance = new_variance
+
+    return passes
+
+
+def get_block_ratings(block, overall):
+    """
+    Get the Overall ratings of the players of a tier as floats.
+    Empty slots count as an average player of their slot.
+    """
+    filled = block >= 0
+    ratings = np.where(filled, overall[np.where(filled, block, 0)], 0).astype(
+        np.float64
+    )
+    slot_means = ratings.sum(axis=0) / np.maximum(filled.sum(axis=0), 1)
+
+    return np.where(filled, ratings, slot_means)
+
+
+def assign_slot(block, ratings, totals, slot, rng):
+    """
+    Assign the players of one slot to the teams: the strongest player to the
+    team with the lowest total of the other slots. Ties are broken at random.
+    """
+    number_of_teams = len(totals)
+
+    team_order = np.lexsort((rng.random(number_of_teams), totals))
+    player_order = np.lexsort((rng.random(number_of_teams), -ratings[:, slot]))
+
+    new_rows = np.empty(number_of_teams, dtype=np.int64)
+    new_rows[team_order] = player_order
+
+    block[:, slot] = block[new_rows, slot]
+    ratings[:, slot] = ratings[new_rows, slot]
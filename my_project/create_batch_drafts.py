@@ -0,0 +1,427 @@
+"""
+This module handles the creation of many drafts in a single run.
+The dataset is loaded once and every draft is made on arrays of player row indices,
+so thousands of seeded leagues can be generated for balance studies.
+"""
+
+import importlib
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from multiprocessing import shared_memory
+import numpy as np
+from .balance_teams import balance_tiers
+from .create_players import create_availability
+from .create_players import draft_all_positions
+from .create_super_league import criteria
+from .create_super_league import get_file_path
+from .create_super_league import get_leagues
+from .create_super_league import get_position_columns
+from .create_super_league import get_position_slots
+from .create_super_league import get_team_names
+from .create_super_league import get_tiers
+from .create_super_league import set_criteria
+from .dataset_cache import load_players
+from .draft_archive import append_drafts
+from .player_pool import get_pool_index
+from .position_index import get_player_ids
+from .settings import get_leagues_path
+
+# Shared arrays of a worker process, set once by init_worker
+worker_state = {}
+
+# Most drafts in one chunk of a batch
+MAX_CHUNK_DRAFTS = 2000
+
+
+def create_drafts(
+    number_of_drafts,
+    seed=None,
+    output_file_path=None,
+    workers=1,
+    structure=None,
+    formation=None,
+    mode=None,
+    player_filter=None,
+    score_profile=None,
+    archive_path=None,
+):
+    """
+    Create a batch of independent drafts and save them as one NPZ file.
+    Every draft gets its own random generator spawned from the seed,
+    so a draft only depends on the seed and its draft number.
+    With more than one worker the drafts are spread over a process pool;
+    the result is the same for any number of workers.
+    The league structure and formation are read from the config files.
+    In the balanced mode the teams of every tier are made as equal as possible.
+    A player filter (such as "gender=F") drafts from part of the player pool,
+    and a score profile ranks the players by weighted attributes.
+    With an archive path the drafts are appended to that draft archive
+    instead of saved as an NPZ file.
+    The drafts are written to disk as they are made, so a batch doesn't have
+    to fit in memory.
+
+    Returns:
+        str: The path to the saved NPZ file or the archive.
+    """
+    # Print Banner
+    print_banner_batch()
+
+    set_criteria(structure, formation, mode, player_filter, score_profile)
+
+    # Load the dataset once for the whole batch
+    file_path = get_file_path()
+    datafile = load_players(file_path)
+
+    position_slots = get_position_slots(datafile)
+    position_index = get_pool_index(
+        file_path, datafile, criteria["pool"], criteria["score"]
+    )
+    player_ids = get_player_ids(datafile)
+    overall = datafile["Overall"].to_numpy(dtype=np.int32)
+
+    # The root seed sequence, every draft spawns its own child from it
+    seed_sequence = np.random.SeedSequence(seed)
+
+    if archive_path is None and output_file_path is None:
+        output_file_path = os.path.join(get_leagues_path(), "batch_drafts.npz")
+
+    # The drafts are written to a memory-mapped file next to the output as they
+    # are made, and copied from it in chunks, so the batch never sits in memory
+    target_path = archive_path if archive_path is not None else output_file_path
+    drafts_path = f"{target_path}.drafts.tmp.npy"
+    drafts = np.lib.format.open_memmap(
+        drafts_path,
+        mode="w+",
+        dtype=np.int32,
+        shape=get_batch_shape(number_of_drafts, position_slots),
+    )
+
+    try:
+        generate_drafts(
+            position_index,
+            position_slots,
+            player_ids,
+            overall,
+            number_of_drafts,
+            seed_sequence.entropy,
+            workers,
+            drafts,
+        )
+        save_drafts(
+            drafts,
+            archive_path,
+            output_file_path,
+            position_slots,
+            file_path,
+            seed_sequence,
+        )
+    finally:
+        # Close the memory map before the file is removed
+        del drafts
+        os.remove(drafts_path)
+
+    return target_path
+
+
+def save_drafts(
+    drafts, archive_path, output_file_path, position_slots, file_path, seed_sequence
+):
+    """
+    Append the drafts to the archive, or else save them as one NPZ file
+    with the league structure, formation and seed of the batch.
+    """
+    number_of_drafts = len(drafts)
+
+    if archive_path is not None:
+        draft_ids = append_drafts(
+            archive_path,
+            drafts,
+            {
+                "names": get_team_names(),
+                "tiers": get_tiers(),
+                "leagues": get_leagues(),
+                "positions": get_position_columns(position_slots),
+                "slots": [list(position_slot) for position_slot in position_slots],
+                "structure": criteria["structure"],
+                "extra_number": criteria["extra_number"],
+                "formation": criteria["formation"],
+                "dataset": file_path,
+            },
+            {
+                "seed_entropy": str(seed_sequence.entropy),
+                "mode": criteria["mode"],
+                "pool": criteria["pool"],
+                "score": criteria["score"],
+            },
+        )
+        print(
+            f"{number_of_drafts} drafts added to {archive_path} "
+            f"as IDs {draft_ids.start} to {draft_ids.stop - 1}\n"
+        )
+        return
+
+    np.savez(
+        output_file_path,
+        drafts=drafts,
+        positions=np.array(get_position_columns(position_slots)),
+        team_names=np.array(get_team_names()),
+        tier_names=np.array([tier_name for tier_name, _ in get_tiers()]),
+        tier_sizes=np.array([number_of_teams for _, number_of_teams in get_tiers()]),
+        league_names=np.array([league[0] for league in get_leagues()]),
+        league_sizes=np.array([league[1] for league in get_leagues()]),
+        league_tiers=np.array([league[2] for league in get_leagues()]),
+        structure=np.array(criteria["structure"]),
+        formation=np.array(criteria["formation"]),
+        mode=np.array(criteria["mode"]),
+        pool=np.array(criteria["pool"]),
+        score=np.array(criteria["score"]),
+        seed_entropy=np.array(str(seed_sequence.entropy)),
+        dataset=np.array(file_path),
+    )
+    print(f"{number_of_drafts} drafts saved at: {output_file_path}\n")
+
+
+def generate_drafts(
+    position_index,
+    position_slots,
+    player_ids,
+    overall,
+    number_of_drafts,
+    entropy,
+    workers=1,
+    output=None,
+):
+    """
+    Generate the draft boards for a batch, in this process or in a process pool.
+    The drafts are made in chunks and every finished chunk is written straight
+    to the output, so with a memory-mapped output (np.lib.format.open_memmap)
+    the batch never has to fit in memory.
+
+    Returns:
+        numpy.ndarray: Player row indices with shape
+            (drafts, teams, position slots), the output when one is given.
+    """
+    shape = get_batch_shape(number_of_drafts, position_slots)
+
+    if output is None:
+        output = np.empty(shape, dtype=np.int32)
+    elif output.shape != shape:
+        raise ValueError(f"The output has shape {output.shape}, the batch {shape}")
+
+    chunks = get_chunks(number_of_drafts, workers)
+
+    if workers <= 1:
+        available = create_availability(player_ids)
+        for start, stop in chunks:
+            draft_range(
+                position_index,
+                position_slots,
+                player_ids,
+                overall,
+                output[start:stop],
+                entropy,
+                start,
+                available,
+            )
+        return output
+
+    generate_drafts_in_pool(
+        position_index,
+        position_slots,
+        player_ids,
+        overall,
+        output,
+        chunks,
+        entropy,
+        workers,
+    )
+
+    return output
+
+
+def get_batch_shape(number_of_drafts, position_slots):
+    """
+    Get the shape of a batch with the set criteria: (drafts, teams, position slots).
+    """
+    total_teams = sum(tier["teams"] for tier in criteria["tiers"])
+    total_slots = sum(slots for _, slots in position_slots)
+
+    return (number_of_drafts, total_teams, total_slots)
+
+
+def get_chunks(number_of_drafts, workers):
+    """
+    Split a batch in chunks of draft numbers: a few per worker to balance the
+    load, and at most MAX_CHUNK_DRAFTS each to bound the memory of a chunk.
+    """
+    chunk_size = max(1, math.ceil(number_of_drafts / (max(workers, 1) * 8)))
+    chunk_size = min(chunk_size, MAX_CHUNK_DRAFTS)
+
+    return [
+        (start, min(start + chunk_size, number_of_drafts))
+        for start in range(0, number_of_drafts, chunk_size)
+    ]
+
+
+def draft_range(
+    position_index,
+    position_slots,
+    player_ids,
+    overall,
+    drafts,
+    entropy,
+    start,
+    available=None,
+):
+    """
+    Fill the drafts with the boards of draft numbers start, start + 1, ...
+    The generator of a draft is the child of the root seed sequence with the
+    draft number as spawn key, the same child SeedSequence.spawn would give.
+    One availability array is reused for all drafts of the range.
+    The Overall ratings are used to balance the teams in the balanced mode.
+    """
+    if available is None:
+        available = create_availability(player_ids)
+
+    drafts.fill(-1)
+
+    for offset, board in enumerate(drafts):
+        draft_seed = np.random.SeedSequence(entropy, spawn_key=(start + offset,))
+        rng = np.random.default_rng(draft_seed)
+        draft_all_positions(
+            position_index,
+            position_slots,
+            criteria,
+            board,
+            rng,
+            player_ids,
+            available,
+        )
+
+        if criteria["mode"] == "balanced":
+            balance_tiers(board, overall, criteria, rng)
+
+
+def generate_drafts_in_pool(
+    position_index,
+    position_slots,
+    player_ids,
+    overall,
+    output,
+    chunks,
+    entropy,
+    workers,
+):
+    """
+    Generate the drafts with a process pool.
+    The sorted player indices, the player IDs and the ratings live in shared
+    memory, so the workers read the players without pickling them. Every worker
+    returns its finished chunk, which is written to the output as soon as it
+    arrives, so only the chunks in flight are held in memory.
+    """
+    # Pack the sorted indices of all positions, the player IDs and the ratings
+    position_names = list(position_index)
+    arrays = [position_index[name] for name in position_names]
+    arrays += [player_ids, overall]
+    offsets = np.cumsum([0] + [len(array) for array in arrays])
+    packed = np.concatenate(arrays).astype(np.int32)
+
+    players_memory = shared_memory.SharedMemory(create=True, size=max(packed.nbytes, 1))
+
+    try:
+        np.ndarray(packed.shape, dtype=np.int32, buffer=players_memory.buf)[:] = packed
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(
+                players_memory.name,
+                position_names,
+                offsets.tolist(),
+                output.shape[1:],
+                position_slots,
+                dict(criteria),
+            ),
+        ) as executor:
+            futures = {
+                executor.submit(draft_chunk, start, stop, entropy): start
+                for start, stop in chunks
+            }
+            for future in as_completed(futures):
+                chunk = future.result()
+                start = futures.pop(future)
+                output[start : start + len(chunk)] = chunk
+    finally:
+        players_memory.close()
+        players_memory.unlink()
+
+
+def init_worker(
+    players_name,
+    position_names,
+    offsets,
+    board_shape,
+    position_slots,
+    criteria_values,
+):
+    """
+    Attach a pool worker to the shared players array.
+    """
+    criteria.update(criteria_values)
+
+    players_memory = shared_memory.SharedMemory(name=players_name)
+
+    packed = np.ndarray((offsets[-1],), dtype=np.int32, buffer=players_memory.buf)
+    packed.flags.writeable = False
+
+    worker_state["players_memory"] = players_memory
+    worker_state["position_index"] = {
+        name: packed[offsets[i] : offsets[i + 1]]
+        for i, name in enumerate(position_names)
+    }
+    worker_state["player_ids"] = packed[offsets[-3] : offsets[-2]]
+    worker_state["overall"] = packed[offsets[-2] : offsets[-1]]
+    worker_state["available"] = create_availability(worker_state["player_ids"])
+    worker_state["board_shape"] = tuple(board_shape)
+    worker_state["position_slots"] = position_slots
+
+
+def draft_chunk(start, stop, entropy):
+    """
+    Draft one chunk of the batch inside a pool worker.
+
+    Returns:
+        numpy.ndarray: The boards of draft numbers start up to stop.
+    """
+    drafts = np.empty((stop - start, *worker_state["board_shape"]), dtype=np.int32)
+    draft_range(
+        worker_state["position_index"],
+        worker_state["position_slots"],
+        worker_state["player_ids"],
+        worker_state["overall"],
+        drafts,
+        entropy,
+        start,
+        worker_state["available"],
+    )
+
+    return drafts
+
+
+def print_banner_batch():
+    """
+    Print a banner for the batch draft process.
+    """
+    width = 40
+
+    print("=" * width)
+    print("Create Batch Drafts".center(width))
+    print("=" * width)
+
+
+if __name__ == "__main__":
+    # The command line of every part of the tool is in main.py
+    importlib.import_module("main").main(["batch", *sys.argv[1:]])
@@ -1,57 +1,260 @@
 """
 This module handles the creation of a filtered dataset from an original dataset.
 It extracts specific columns and saves the result in an edited directory.
+The source files are streamed in chunks, so memory use stays bounded
+no matter how large the original datasets are.
+It also creates the player pool: the male and female players of several
+seasons in one dataset.
 """
 
+import json
 import os
-from dotenv import load_dotenv
+import numpy as np
 import pandas as pd
+from .scoring import ATTRIBUTE_COLUMNS
+from .settings import get_settings
+from .settings import refresh_settings
 
+# Columns kept in the edited dataset, with the types used while reading
+COLUMN_DTYPES = {
+    "Name": "string",
+    "Nation": "category",
+    "Club": "category",
+    "Position": "category",
+    "Age": "Int16",
+    "Overall": "Int16",
+}
+COLUMNS_TO_KEEP = list(COLUMN_DTYPES)
 
-def create_male_dataset():
+CHUNK_SIZE = 5000
+
+
+def create_male_dataset(source_file_names=None):
     """
     Creates a new dataset with selected columns from the original dataset.
     The new dataset includes only:
-        'Name', 'Nation', 'Club', 'Position', 'Age', and 'Overall'.
+        'Name', 'Nation', 'Club', 'Position', 'Age', and 'Overall',
+        followed by the attribute columns used by the score profiles.
     The new dataset is saved in the edited directory. If the file already exists, it is overwritten.
+    Several source files (for example dumps of multiple seasons) can be merged into one dataset.
     """
-    print_banner_dataset()
+    if source_file_names is None:
+        source_file_names = ["male_players.csv"]
+
+    create_edited_dataset(source_file_names, "male_players_edited.csv")
 
-    # Load environment variables
-    load_dotenv()
 
-    # Load the base directory from the environment variable
-    original_dataset_path = os.getenv("ORIGINAL_DATASET_PATH")
+def create_female_dataset(source_file_names=None):
+    """
+    Creates a new dataset with selected columns from the original female dataset.
+    It has the same columns as the male dataset.
+    """
+    if source_file_names is None:
+        source_file_names = ["female_players.csv"]
 
-    # Concatenate the base directory with the filename
-    male_file_path = os.path.join(original_dataset_path, "male_players.csv")
+    create_edited_dataset(source_file_names, "female_players_edited.csv")
 
-    # Load the edited directory from the environment variable
-    edited_dir = os.getenv("EDITED_DATASET_PATH")
 
-    # Ensure the edited directory exists
-    os.makedirs(edited_dir, exist_ok=True)
+def create_edited_dataset(source_file_names, new_file_name):
+    """
+    Stream the source files from the original directory into one edited dataset.
+    Only the needed columns are read, chunk by chunk, and every chunk is
+    appended to the new file right away.
+
+    Returns:
+        str: The path to the new dataset file.
+    """
+    print_banner_dataset()
 
-    # Load the dataset
-    datafile = pd.read_csv(male_file_path)
+    # Load the original and edited directories from the settings
+    settings = get_settings()
+    original_dataset_path = settings["original_dataset_path"]
+    edited_dir = settings["edited_dataset_path"]
 
-    # Extract the required columns
-    columns_to_keep = ["Name", "Nation", "Club", "Position", "Age", "Overall"]
-    df_filtered = datafile[columns_to_keep]
+    # Ensure the edited directory exists
+    os.makedirs(edited_dir, exist_ok=True)
 
-    # Create the new file name
-    original_file_name = os.path.basename(male_file_path)
-    new_file_name = f"{os.path.splitext(original_file_name)[0]}_edited.csv"
     new_file_path = os.path.join(edited_dir, new_file_name)
 
     # Check if the file already exists
     if os.path.exists(new_file_path):
         print(f"File already exists: {new_file_path}. Overwriting...\n")
 
-    # Save the filtered DataFrame to a new CSV file
-    df_filtered.to_csv(new_file_path, index=False)
+    # Write to a temporary file, so an interrupted run keeps the old dataset
+    temp_file_path = f"{new_file_path}.tmp"
+    write_header = True
+    total_rows = 0
+
+    # Concatenate the base directory with the filenames
+    source_file_paths = [
+        os.path.join(original_dataset_path, source_file_name)
+        for source_file_name in source_file_names
+    ]
+    columns = COLUMNS_TO_KEEP + get_shared_attributes(source_file_paths)
+
+    for source_file_path in source_file_paths:
+        chunks = pd.read_csv(
+            source_file_path,
+            usecols=columns,
+            dtype=get_column_dtypes(columns),
+            chunksize=CHUNK_SIZE,
+        )
+
+        for chunk in chunks:
+            # Keep the columns in the same order for every source
+            chunk[columns].to_csv(
+                temp_file_path,
+                mode="w" if write_header else "a",
+                header=write_header,
+                index=False,
+            )
+            write_header = False
+            total_rows += len(chunk)
+
+    os.replace(temp_file_path, new_file_path)
+
+    # The new file can change which dataset the draft uses
+    refresh_settings()
+
+    print(f"Processed file saved as: {new_file_path} ({total_rows} players)\n")
+
+    return new_file_path
+
+
+def create_player_pool(config_path=None):
+    """
+    Stream the sources of the player pool config (PLAYER_POOL_CONFIG_PATH,
+    default config/player_pool.json) into one dataset, player_pool.csv.
+    Every row gets the gender, season and source file of its player and the
+    EA player ID from the URL (-1 without a URL), which stays the same over
+    seasons, followed by the attribute columns all sources have.
+    A player listed twice in the same season is only kept once.
+
+    Returns:
+        str: The path to the player pool file.
+    """
+    print_banner_dataset()
+
+    settings = get_settings()
+    if config_path is None:
+        config_path = settings["player_pool_config_path"]
+
+    with open(config_path, encoding="utf-8") as config_file:
+        sources = json.load(config_file).get("sources", [])
+
+    if not sources:
+        raise ValueError(f"The player pool in {config_path} has no sources")
+
+    edited_dir = settings["edited_dataset_path"]
+    os.makedirs(edited_dir, exist_ok=True)
+    new_file_path = os.path.join(edited_dir, "player_pool.csv")
+
+    temp_file_path = f"{new_file_path}.tmp"
+    write_header = True
+    total_rows = 0
+    seen_players = {}
+
+    for source in sources:
+        if "file" not in source or "season" not in source:
+            raise ValueError(
+                f"Every source in {config_path} needs a 'file' and a 'season'"
+            )
+
+    source_file_paths = [
+        os.path.join(settings["original_dataset_path"], source["file"])
+        for source in sources
+    ]
+    attributes = get_shared_attributes(source_file_paths)
+
+    for source, source_file_path in zip(sources, source_file_paths):
+        header = pd.read_csv(source_file_path, nrows=0).columns
+        extra_columns = [name for name in ["URL", "Gender"] if name in header]
+
+        if "gender" not in source and "Gender" not in header:
+            raise ValueError(f"Give the gender of {source['file']} in {config_path}")
+
+        columns = COLUMNS_TO_KEEP + attributes + extra_columns
+        chunks = pd.read_csv(
+            source_file_path,
+            usecols=columns,
+            dtype=get_column_dtypes(columns),
+            chunksize=CHUNK_SIZE,
+        )
+
+        for chunk in chunks:
+            pool_chunk = chunk[COLUMNS_TO_KEEP].copy()
+            pool_chunk["Gender"] = source.get("gender", chunk.get("Gender"))
+            pool_chunk["Season"] = source["season"]
+            pool_chunk["Source"] = os.path.splitext(source["file"])[0]
+            pool_chunk["Player ID"] = get_ea_player_ids(chunk)
+            pool_chunk[attributes] = chunk[attributes]
+
+            # Keep the first row of a player in a season
+            season_players = seen_players.setdefault(source["season"], set())
+            player_ids = pool_chunk["Player ID"]
+            known = player_ids >= 0
+            keep = ~(
+                known & (player_ids.isin(season_players) | player_ids.duplicated())
+            )
+            season_players.update(player_ids[keep & known].tolist())
+            pool_chunk = pool_chunk[keep]
+
+            pool_chunk.to_csv(
+                temp_file_path,
+                mode="w" if write_header else "a",
+                header=write_header,
+                index=False,
+            )
+            write_header = False
+            total_rows += len(pool_chunk)
+
+    os.replace(temp_file_path, new_file_path)
+
+    # The pool is used for the drafts from now on
+    refresh_settings()
+
+    print(f"Player pool saved as: {new_file_path} ({total_rows} players)\n")
+
+    return new_file_path
+
+
+def get_shared_attributes(source_file_paths):
+    """
+    Get the attribute columns that every source file has, in the usual order.
+    """
+    attributes = list(ATTRIBUTE_COLUMNS)
+
+    for source_file_path in source_file_paths:
+        header = set(pd.read_csv(source_file_path, nrows=0).columns)
+        attributes = [name for name in attributes if name in header]
+
+    return attributes
+
+
+def get_column_dtypes(columns):
+    """
+    Get the types used while reading columns; attributes are small whole numbers.
+    """
+    return {
+        name: COLUMN_DTYPES.get(name, "Int16")
+        for name in columns
+        if name in COLUMN_DTYPES or name in ATTRIBUTE_COLUMNS
+    }
+
+
+def get_ea_player_ids(chunk):
+    """
+    Get the EA player IDs from the URL column, the number at the end of the URL.
+
+    Returns:
+        numpy.ndarray: int64 player IDs, -1 for rows without a URL or ID.
+    """
+    if "URL" not in chunk.columns:
+        return np.full(len(chunk), -1, dtype=np.int64)
+
+    ea_ids = chunk["URL"].str.extract(r"/(\d+)/?$", expand=False)
 
-    print(f"Processed file saved as: {new_file_path}\n")
+    return pd.to_numeric(ea_ids).fillna(-1).to_numpy(dtype=np.int64)
 
 
 def print_banner_dataset():
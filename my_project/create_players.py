@@ -1,258 +1,193 @@
 """
 This module handles the draft of the different players.
 It includes functions to draft player_positions based on specific criteria.
+Players are handled as their row index in the dataset, and the draft board is an
+integer matrix with one row per team and one column per position slot.
+A position with k slots per team (two CBs in a back four) is drafted in one go.
+One availability array over the player IDs is shared by all positions of a draft,
+so a player listed for several positions is drafted at most once.
 """
 
-import os
-import pandas as pd
 import numpy as np
-
-
-def remove_duplicates(dataframe):
+from .instrumentation import add_counts
+from .instrumentation import trace_stage
+
+
+def draft_all_positions(
+    position_index,
+    position_slots,
+    criteria,
+    players,
+    rng,
+    player_ids,
+    available=None,
+):
     """
-    Remove duplicate players based on their names from the DataFrame.
+    Draft every position of the board from the position index.
+    The position slots are pairs of position and slots per team, in the order of
+    the board columns; a position with more slots fills that many columns.
+    The player IDs of the dataset rows decide which rows are the same player.
+    An availability array from create_availability can be given to reuse it
+    between drafts; it is reset before the draft.
     """
-    dataframe = dataframe.drop_duplicates(subset=["Name"], keep="first")
-    return dataframe
+    if available is None:
+        available = create_availability(player_ids)
+    else:
+        available.fill(True)
+
+    availability = (player_ids, available)
+    column = 0
+
+    for position, slots in position_slots:
+        with trace_stage("draft_position", position=position, slots=slots) as counters:
+            draft_position(
+                position_index[position],
+                criteria,
+                (column, slots),
+                players,
+                rng,
+                availability,
+                counters,
+            )
+        column += slots
 
 
-def draft_player_position(player_pos_data, criteria, position_column):
+def create_availability(player_ids):
     """
-    Draft player_positions based on the top ratings and save to a CSV file.
+    Create the availability array of a draft: one boolean per player ID,
+    True while the player has not been drafted.
     """
-    extra_number = 10
-    number_of_top_player_pos = criteria["premier_league"] + extra_number
+    number_of_players = int(player_ids.max()) + 1 if len(player_ids) else 0
 
-    player_pos_sorted = player_pos_data.sort_values(by="Overall", ascending=False)
-    top_player_pos = player_pos_sorted.head(number_of_top_player_pos)
-    top_player_pos = top_player_pos.sample(frac=1).reset_index(drop=True)
+    return np.ones(number_of_players, dtype=bool)
 
-    number_of_other_player_pos = (
-        criteria["middle_league"] + criteria["bottom_league"] - extra_number
-    )
-    other_player_pos = player_pos_sorted.iloc[
-        number_of_top_player_pos : number_of_top_player_pos + number_of_other_player_pos
-    ]
 
-    if len(top_player_pos) >= criteria["premier_league"]:
-        premier_player_pos = top_player_pos.head(criteria["premier_league"])
-        remaining_player_pos = top_player_pos.tail(extra_number)
-    else:
-        premier_player_pos = top_player_pos
-        remaining_player_pos = pd.DataFrame()
-
-    premier_player_pos_str = premier_player_pos.apply(
-        lambda row: ", ".join(map(str, row)), axis=1
+def draft_position(
+    sorted_indices, criteria, columns, players, rng, availability, counters=None
+):
+    """
+    Draft the players of one position and fill them in the draft board.
+    The sorted indices come from the position index, best player first.
+    The columns are the first board column and the number of slots per team;
+    every tier takes slots x teams players at once and fills its block of the
+    board slot by slot, so the first slot gets the first teams players.
+    The availability is a pair of the player IDs of all rows and the
+    availability array; drafted players are marked as taken in it.
+    Counters of a traced stage are updated when given.
+    """
+    first_column, slots = columns
+
+    tier_rows = get_tier_rows(criteria)
+    tier_slots = [number_of_teams * slots for _, number_of_teams in tier_rows]
+
+    allocation = allocate_tiers(
+        sorted_indices,
+        tier_slots,
+        criteria["extra_number"],
+        rng,
+        availability,
+        counters,
     )
 
-    leagues_path = os.getenv("LEAGUES_PATH")
-    output_file_path = os.path.join(leagues_path, "super_draft.csv")
-
-    draft_data = pd.read_csv(output_file_path, dtype={position_column: "object"})
-
-    draft_data.iloc[
-        : criteria["premier_league"], draft_data.columns.get_loc(position_column)
-    ] = premier_player_pos_str.values
-
-    if not remaining_player_pos.empty:
-        middle_start = criteria["premier_league"]
-        middle_end = middle_start + criteria["middle_league"]
-
-        if len(draft_data) > middle_start:
-            middle_player_pos_indices = np.random.choice(
-                range(middle_start, middle_end),
-                size=len(remaining_player_pos),
-                replace=False,
-            )
-            middle_player_pos_str = remaining_player_pos.apply(
-                lambda row: ", ".join(map(str, row)), axis=1
-            )
-            draft_data.iloc[
-                middle_player_pos_indices, draft_data.columns.get_loc(position_column)
-            ] = middle_player_pos_str.values
-
-    draft_data = remove_duplicates(draft_data)
-
-    draft_data.to_csv(output_file_path, index=False)
-
-    draft_middle_low_leagues(other_player_pos, criteria, extra_number, position_column)
-    # print(f"Super draft CSV file updated at: {output_file_path}\n")
+    for (start, number_of_teams), tier_players in zip(tier_rows, allocation):
+        # Pad a short tier with empty slots, then lay the players out per slot
+        block = np.full(number_of_teams * slots, -1, dtype=players.dtype)
+        block[: len(tier_players)] = tier_players
+        players[
+            start : start + number_of_teams, first_column : first_column + slots
+        ] = block.reshape(slots, number_of_teams).T
 
 
-def draft_middle_low_leagues(other_player_pos, criteria, extra_number, position_column):
+def allocate_tiers(
+    sorted_indices, tier_slots, extra_number, rng, availability, counters=None
+):
     """
-    Draft middle and bottom league player_positions based on their ratings
-     and fill all remaining slots in the CSV file.
+    Split the sorted players of a position over the tiers, from the top tier down.
+    Every tier shuffles the best available players that are left plus
+    extra_number more, and keeps as many as it has slots. The extra players
+    spill over into the next tier, where they always get a place.
+    Every player is taken from the sorted order once, so the work grows
+    linearly with the number of players, whatever the number of tiers.
+
+    Returns:
+        list: The shuffled players of every tier. A tier gets fewer players
+        than slots when the position runs out of players.
     """
+    player_ids, available = availability
 
-    total_needed_player_pos = criteria["middle_league"] + criteria["bottom_league"]
+    allocation = []
+    offset = 0
+    spill = sorted_indices[:0]
 
-    other_player_pos_sorted = other_player_pos.sort_values(
-        by="Overall", ascending=False
-    )
-    needed_player_pos = other_player_pos_sorted.head(
-        total_needed_player_pos + extra_number
-    )
-    needed_player_pos = needed_player_pos.sample(frac=1).reset_index(drop=True)
-
-    leagues_path = os.getenv("LEAGUES_PATH")
-    output_file_path = os.path.join(leagues_path, "super_draft.csv")
-
-    draft_data = pd.read_csv(output_file_path, dtype={position_column: "object"})
-
-    middle_start = criteria["premier_league"]
-    middle_end = middle_start + criteria["middle_league"]
+    for tier_number, slots in enumerate(tier_slots):
+        is_last_tier = tier_number == len(tier_slots) - 1
 
-    if len(draft_data) > middle_start:
-        middle_player_pos = needed_player_pos.head(criteria["middle_league"])
-        middle_player_pos_str = middle_player_pos.apply(
-            lambda row: ", ".join(map(str, row)), axis=1
-        )
-        middle_player_pos_indices = np.random.choice(
-            range(middle_start, min(middle_end, len(draft_data))),
-            size=len(middle_player_pos),
-            replace=False,
-        )
-        draft_data.iloc[
-            middle_player_pos_indices, draft_data.columns.get_loc(position_column)
-        ] = middle_player_pos_str.values
-
-    bottom_start = middle_end
-    bottom_end = bottom_start + criteria["bottom_league"]
-
-    if len(draft_data) > bottom_start:
-        remaining_needed_for_bottom = criteria["bottom_league"]
-        bottom_player_pos = needed_player_pos.iloc[
-            len(middle_player_pos) : len(middle_player_pos)
-            + remaining_needed_for_bottom
-        ]
-        bottom_player_pos_str = bottom_player_pos.apply(
-            lambda row: ", ".join(map(str, row)), axis=1
+        # Take the best players that are left, plus the extra players
+        needed = max(slots - len(spill), 0)
+        block_size = needed if is_last_tier else needed + extra_number
+        block, offset = take_available(
+            sorted_indices, offset, block_size, availability, counters
         )
+        block = rng.permutation(block)
 
-        if len(bottom_player_pos) < remaining_needed_for_bottom:
-            additional_needed = remaining_needed_for_bottom - len(bottom_player_pos)
-            additional_player_pos = needed_player_pos.iloc[-additional_needed:]
-            additional_player_pos_str = additional_player_pos.apply(
-                lambda row: ", ".join(map(str, row)), axis=1
-            )
-            bottom_player_pos_str = pd.concat(
-                [bottom_player_pos_str, additional_player_pos_str]
-            )
+        # Spilled players come first, the rest of the block spills further
+        tier_players = rng.permutation(np.concatenate([spill[:slots], block[:needed]]))
+        spill = np.concatenate([spill[slots:], block[needed:]])
 
-        bottom_player_pos_indices = np.random.choice(
-            range(bottom_start, min(bottom_end, len(draft_data))),
-            size=len(bottom_player_pos_str),
-            replace=False,
-        )
-        draft_data.iloc[
-            bottom_player_pos_indices, draft_data.columns.get_loc(position_column)
-        ] = bottom_player_pos_str.values
+        allocation.append(tier_players)
+        add_counts(counters, rows=len(block), rng_draws=len(block) + len(tier_players))
 
-    draft_data = remove_duplicates(draft_data)
+    # Spilled players that did not get a place are free for other positions
+    if len(spill):
+        available[player_ids[spill]] = True
 
-    draft_data.to_csv(output_file_path, index=False)
-    # print(
-    #     f"Super draft CSV file updated for middle and bottom leagues at: {output_file_path}\n"
-    # )
+    return allocation
 
 
-def draft_top_cbs(datafile, criteria, extra_number):
-    """
-    Draft player_positions for multiple based on the top ratings and save to a CSV file.
+def take_available(sorted_indices, offset, count, availability, counters=None):
     """
+    Take the next count players from the sorted indices that are still available,
+    starting at offset, and mark them as taken.
+    Looking up and updating a player costs one array access, and every player
+    is looked at once per draft.
 
-    # Filter data for CB position
-    cb_data = datafile[datafile["Position"] == "CB"]
-
-    # Sort CBs by Overall rating
-    cb_sorted = cb_data.sort_values(by="Overall", ascending=False)
-
-    # Select top CBs (double the amount for premier league plus extra)
-    number_of_top_cbs = (criteria["premier_league"] * 2) + extra_number
-    top_cbs = cb_sorted.head(number_of_top_cbs)
-
-    # Shuffle the top CBs
-    top_cbs = top_cbs.sample(frac=1).reset_index(drop=True)
-
-    # Split top CBs for CB1 and CB2
-    cb1_top = top_cbs.iloc[: len(top_cbs) // 2]
-    cb2_top = top_cbs.iloc[len(top_cbs) // 2 :]
+    Returns:
+        tuple: The taken players and the offset after the last player looked at.
+    """
+    player_ids, available = availability
+    taken = []
 
-    # Convert to string format
-    cb1_top_str = cb1_top.apply(lambda row: ", ".join(map(str, row)), axis=1)
-    cb2_top_str = cb2_top.apply(lambda row: ", ".join(map(str, row)), axis=1)
+    while count > 0 and offset < len(sorted_indices):
+        candidates = sorted_indices[offset : offset + count]
+        offset += len(candidates)
 
-    # Read the existing draft data
-    leagues_path = os.getenv("LEAGUES_PATH")
-    output_file_path = os.path.join(leagues_path, "super_draft.csv")
-    draft_data = pd.read_csv(output_file_path)
+        ids = player_ids[candidates]
+        is_available = available[ids]
+        available[ids] = False
 
-    # Ensure CB1 and CB2 columns are of type object (string)
-    draft_data["CB1"] = draft_data["CB1"].astype("object")
-    draft_data["CB2"] = draft_data["CB2"].astype("object")
+        number_available = np.count_nonzero(is_available)
+        if number_available < len(candidates):
+            add_counts(counters, skipped=len(candidates) - number_available)
+            candidates = candidates[is_available]
 
-    # Update CB1 and CB2 columns for premier league
-    draft_data.loc[: criteria["premier_league"] - 1, "CB1"] = cb1_top_str.values[
-        : criteria["premier_league"]
-    ]
-    draft_data.loc[: criteria["premier_league"] - 1, "CB2"] = cb2_top_str.values[
-        : criteria["premier_league"]
-    ]
+        taken.append(candidates)
+        count -= len(candidates)
 
-    # Save the updated draft data
-    draft_data.to_csv(output_file_path, index=False)
+    if len(taken) == 1:
+        return taken[0], offset
 
-    return cb_sorted.iloc[number_of_top_cbs:]
+    return np.concatenate([sorted_indices[:0], *taken]), offset
 
 
-def draft_middle_bottom_cbs(remaining_cbs, criteria, extra_number):
+def get_tier_rows(criteria):
     """
-    Draft middle and bottom league player_positions for multple positions based on their ratings
-     and fill all remaining slots in the CSV file.
+    Get the first board row and the number of teams of every tier.
     """
-    # Calculate the number of CBs needed for middle and bottom leagues
-    total_needed_cbs = (criteria["middle_league"] + criteria["bottom_league"]) * 2
-
-    # Select and shuffle the needed CBs
-    needed_cbs = remaining_cbs.head(total_needed_cbs + extra_number)
-    needed_cbs = needed_cbs.sample(frac=1).reset_index(drop=True)
-
-    # Split CBs for middle and bottom leagues
-    middle_cbs = needed_cbs.head(criteria["middle_league"] * 2)
-    bottom_cbs = needed_cbs.iloc[len(middle_cbs) : total_needed_cbs]
-
-    # Further split for CB1 and CB2
-    cb1_middle = middle_cbs.iloc[::2]
-    cb2_middle = middle_cbs.iloc[1::2]
-    cb1_bottom = bottom_cbs.iloc[::2]
-    cb2_bottom = bottom_cbs.iloc[1::2]
-
-    # Convert to string format
-    cb1_middle_str = cb1_middle.apply(lambda row: ", ".join(map(str, row)), axis=1)
-    cb2_middle_str = cb2_middle.apply(lambda row: ", ".join(map(str, row)), axis=1)
-    cb1_bottom_str = cb1_bottom.apply(lambda row: ", ".join(map(str, row)), axis=1)
-    cb2_bottom_str = cb2_bottom.apply(lambda row: ", ".join(map(str, row)), axis=1)
-
-    # Read the existing draft data
-    leagues_path = os.getenv("LEAGUES_PATH")
-    output_file_path = os.path.join(leagues_path, "super_draft.csv")
-    draft_data = pd.read_csv(output_file_path)
-
-    # Ensure CB1 and CB2 columns are of type object (string)
-    draft_data["CB1"] = draft_data["CB1"].astype("object")
-    draft_data["CB2"] = draft_data["CB2"].astype("object")
-
-    # Update CB1 and CB2 columns for middle and bottom leagues
-    middle_start = criteria["premier_league"]
-    middle_end = middle_start + criteria["middle_league"]
-    bottom_start = middle_end
-    bottom_end = bottom_start + criteria["bottom_league"]
-
-    draft_data.loc[middle_start : middle_end - 1, "CB1"] = cb1_middle_str.values
-    draft_data.loc[middle_start : middle_end - 1, "CB2"] = cb2_middle_str.values
-    draft_data.loc[bottom_start : bottom_end - 1, "CB1"] = cb1_bottom_str.values
-    draft_data.loc[bottom_start : bottom_end - 1, "CB2"] = cb2_bottom_str.values
-
-    # Save the updated draft data
-    draft_data.to_csv(output_file_path, index=False)
+    tier_rows = []
+    start = 0
+
+    for tier in criteria["tiers"]:
+        tier_rows.append((start, tier["teams"]))
+        start += tier["teams"]
+
+    return tier_rows
@@ -3,148 +3,347 @@ This module handles the creation of a draft for a football league based on speci
 It includes functions to set criteria, create player drafts, and handle file paths.
 """
 
-import os
-from dotenv import load_dotenv
-import pandas as pd
-from .create_players import draft_player_position
-from .create_players import draft_top_cbs
-from .create_players import draft_middle_bottom_cbs
+import json
+import numpy as np
+from .balance_teams import balance_tiers
+from .create_players import draft_all_positions
+from .dataset_cache import load_players
+from .draft_cache import get_cached_draft
+from .draft_cache import get_dataset_fingerprint
+from .draft_cache import get_draft_key
+from .draft_cache import store_draft
+from .draft_board import export_draft
+from .draft_board import save_draft
+from .instrumentation import trace_stage
+from .player_pool import get_pool_index
+from .player_pool import normalize_filter
+from .position_index import get_player_ids
+from .scoring import load_score_profile
+from .settings import get_default_filter
+from .settings import get_settings
 
 # Configuration dictionary for criteria
 criteria = {
+    "structure": None,
     "leagues": None,
-    "premier_league": None,
-    "middle_league": None,
-    "bottom_league": None,
+    "extra_number": None,
+    "tiers": [],
+    "formation": None,
+    "slots": {},
+    "mode": None,
+    "pool": None,
+    "score": None,
+    "score_weights": None,
 }
 
+# Draft modes: random teams, or teams balanced within every tier
+DRAFT_MODES = ["random", "balanced"]
 
-def create_draft():
+
+def create_draft(
+    seed=None,
+    structure=None,
+    formation=None,
+    mode=None,
+    player_filter=None,
+    score_profile=None,
+):
     """
     Create a draft for football leagues based on the set criteria.
     This function prints a banner, sets the criteria, creates a player draft,
     and prepares for team drafting.
+    Passing a seed makes the draft reproducible.
+    The league structure and formation are read from the config files.
+    In the balanced mode the teams of every tier are made as equal as possible.
+    A player filter (such as "gender=F") drafts from part of the player pool,
+    and a score profile ranks the players by weighted attributes.
     """
     # Print Banner
     print_banner_draft()
 
-    set_criteria()
+    with trace_stage("create_draft", seed=seed):
+        with trace_stage("set_criteria"):
+            set_criteria(structure, formation, mode, player_filter, score_profile)
+
+        # Create Player Draft
+        draft_board = create_player_draft(seed)
 
-    # Create Player Draft
-    create_player_draft()
+        # Export a readable version of the draft
+        datafile = load_players(draft_board["dataset"])
+        output_file_path = export_draft(draft_board, datafile)
+
+    print(f"Super draft CSV file saved at: {output_file_path}\n")
 
     # To be updated
     # Created Team Draft
 
 
-def create_player_draft():
+def create_player_draft(seed=None):
     """
     Create a draft of players.
+    All random choices are made with one generator created from the seed,
+    so a seeded draft of the same dataset and criteria is taken from the draft cache.
+    The finished board is saved as an integer matrix of player row indices.
     """
-    # Load the dataset
-    datafile = pd.read_csv(get_file_path())
+    file_path = get_file_path()
+    datafile = load_players(file_path)
 
-    unique_positions = get_unique_positions(datafile)
+    key = get_draft_key(get_dataset_fingerprint(file_path), criteria, seed)
+    draft_board = get_cached_draft(key)
 
-    # Create Empty CSV file and get unique positions
-    create_csv_file(unique_positions)
+    if draft_board is None:
+        position_index = get_pool_index(
+            file_path, datafile, criteria["pool"], criteria["score"]
+        )
+        draft_board = draft_players(
+            datafile,
+            position_index,
+            get_player_ids(datafile),
+            np.random.default_rng(seed),
+        )
+        store_draft(key, draft_board)
 
-    # Filter data by position and update the CSV
-    for position in unique_positions:
-        # Skip "CB1" and "CB2"
-        if position in ["CB", "CB1", "CB2"]:
-            continue
+    draft_board["dataset"] = file_path
 
-        position_data = datafile[datafile["Position"] == position]
-        draft_player_position(position_data, criteria, position)
+    # Write the finished board to disk in one go
+    save_draft(draft_board)
 
-    # For CB positions
-    cb_data = datafile[datafile["Position"] == "CB"]
-    extra_number = 10
-    remaining_cbs = draft_top_cbs(cb_data, criteria, extra_number)
-    draft_middle_bottom_cbs(remaining_cbs, criteria, extra_number)
+    return draft_board
 
 
-def create_csv_file(unique_positions):
+def draft_players(datafile, position_index, player_ids, rng):
     """
-    Create a CSV file with columns for all unique positions found in the dataset.
+    Draft a board in memory with the set criteria, from a loaded dataset,
+    its position index and player IDs.
+
+    Returns:
+        dict: The draft board, without the dataset path.
     """
-    # Calculate the total number of rows
-    total_premier = criteria["premier_league"]
-    total_championship = criteria["middle_league"]
-    total_league_one = criteria["bottom_league"]
+    position_slots = get_position_slots(datafile)
+
+    # Create the empty draft board in memory
+    with trace_stage("create_csv_file", positions=len(position_slots)):
+        draft_board = create_csv_file(position_slots)
+
+    # Draft every position from its sorted players, every player at most once
+    draft_all_positions(
+        position_index,
+        position_slots,
+        criteria,
+        draft_board["players"],
+        rng,
+        player_ids,
+    )
 
-    # Create row names
-    top_names = [f"Top {i+1}" for i in range(total_premier)]
-    middle_names = [f"Middle {i+1}" for i in range(total_championship)]
-    bottom_names = [f"Bottom {i+1}" for i in range(total_league_one)]
+    if criteria["mode"] == "balanced":
+        balance_tiers(
+            draft_board["players"], datafile["Overall"].to_numpy(), criteria, rng
+        )
 
-    # Combine all row names
-    all_names = top_names + middle_names + bottom_names
+    return draft_board
 
-    # Ensure columns for all unique positions
-    columns_dict = {
-        position: pd.Series([None] * len(all_names), dtype="object")
-        for position in unique_positions
+
+def create_csv_file(position_slots):
+    """
+    Create the empty draft board with columns for all position slots of the formation.
+    The board holds one row per team and one column per position slot, filled with -1
+    until the position drafters put player row indices in it.
+    The criteria the board was drafted with are kept, so it can be re-drafted later.
+    """
+    team_names = get_team_names()
+    unique_positions = get_position_columns(position_slots)
+
+    draft_board = {
+        "names": team_names,
+        "tiers": get_tiers(),
+        "leagues": get_leagues(),
+        "structure": criteria["structure"],
+        "extra_number": criteria["extra_number"],
+        "formation": criteria["formation"],
+        "slots": [list(position_slot) for position_slot in position_slots],
+        "mode": criteria["mode"],
+        "pool": criteria["pool"],
+        "score": criteria["score"],
+        "positions": list(unique_positions),
+        "players": np.full(
+            (len(team_names), len(unique_positions)), -1, dtype=np.int32
+        ),
     }
 
-    # Create an empty DataFrame with the specified number of rows and correct dtypes
-    draft_data = pd.DataFrame(columns_dict)
+    return draft_board
 
-    # Insert the 'Name' column as the first column
-    draft_data.insert(0, "Name", pd.Series(all_names, dtype="object"))
 
-    # Get path from environment variable
-    leagues_path = os.getenv("LEAGUES_PATH")
-    output_file_path = os.path.join(leagues_path, "super_draft.csv")
+def get_tiers():
+    """
+    Get the tiers of the draft board as pairs of name and number of teams,
+    from the top tier down.
+    """
+    return [(tier["name"], tier["teams"]) for tier in criteria["tiers"]]
+
 
-    # Save the empty DataFrame to CSV
-    draft_data.to_csv(output_file_path, index=False)
-    print(f"Empty draft CSV file created at: {output_file_path}\n")
-    return unique_positions
+def get_leagues():
+    """
+    Get the leagues of the draft board as name, number of teams and tier number,
+    in the same order as the board rows.
+    """
+    return [
+        (league["name"], league["teams"], tier_number)
+        for tier_number, tier in enumerate(criteria["tiers"])
+        for league in tier["leagues"]
+    ]
 
 
-def set_criteria():
+def get_team_names():
     """
-    Set criteria for the draft, including the number of leagues and teams.
+    Get the team names of the draft board, in the same order as its rows.
     """
-    # Hardcoded values for English Leagues
-    # Can be updated if added options for other leagues
-    criteria["leagues"] = 3
-    criteria["premier_league"] = 20
-    criteria["middle_league"] = 20
-    criteria["bottom_league"] = 24
+    return [
+        f"{league_name} {i+1}"
+        for league_name, number_of_teams, _ in get_leagues()
+        for i in range(number_of_teams)
+    ]
 
 
-def get_file_path():
+def set_criteria(
+    structure=None, formation=None, mode=None, player_filter=None, score_profile=None
+):
     """
-    Determine the file path for the dataset based on whether the edited
-    or original file exists.
+    Set criteria for the draft, including the number of leagues and teams,
+    the formation of every team, the draft mode, the player filter and the
+    score profile the players are ranked by.
+    The league structures are read from the JSON file in LEAGUE_CONFIG_PATH
+    (default config/leagues.json). The structure is chosen by name, by
+    LEAGUE_STRUCTURE or else the English leagues are used.
+    The mode is "random" (default) or "balanced", chosen by name or by DRAFT_MODE.
+    The player filter is given or read from PLAYER_FILTER; without one the
+    player pool drafts its men (see get_default_filter) and a male dataset all players.
+    The score profile is given or read from SCORE_PROFILE; empty ranks by Overall.
+    """
+    settings = get_settings()
 
-    Returns:
-        str: The path to the dataset file.
+    config_path = settings["league_config_path"]
+    if structure is None:
+        structure = settings["league_structure"]
+
+    with open(config_path, encoding="utf-8") as config_file:
+        structures = json.load(config_file)
+
+    if structure not in structures:
+        raise ValueError(
+            f"Unknown league structure '{structure}' in {config_path}. "
+            f"Choose from: {', '.join(structures)}"
+        )
+
+    tiers = get_config_tiers(structures[structure], structure)
+
+    criteria["structure"] = structure
+    criteria["leagues"] = sum(len(tier["leagues"]) for tier in tiers)
+    criteria["extra_number"] = structures[structure].get("extra_number", 10)
+    criteria["tiers"] = tiers
+
+    if mode is None:
+        mode = settings["draft_mode"]
+    if mode not in DRAFT_MODES:
+        raise ValueError(
+            f"Unknown draft mode '{mode}'. Choose from: {', '.join(DRAFT_MODES)}"
+        )
+    criteria["mode"] = mode
+
+    if player_filter is None:
+        player_filter = settings["player_filter"] or get_default_filter(settings)
+    criteria["pool"] = normalize_filter(player_filter)
+
+    if score_profile is None:
+        score_profile = settings["score_profile"]
+    criteria["score"] = score_profile
+    criteria["score_weights"] = (
+        load_score_profile(score_profile) if score_profile else None
+    )
+
+    set_formation(formation)
+
+
+def set_formation(formation=None):
+    """
+    Set the formation of the teams: the number of slots per team for every position.
+    The formations are read from the JSON file in FORMATION_CONFIG_PATH
+    (default config/formations.json). The formation is chosen by name, by
+    FORMATION or else every position gets one slot and CB two.
+    """
+    settings = get_settings()
+
+    config_path = settings["formation_config_path"]
+    if formation is None:
+        formation = settings["formation"]
+
+    with open(config_path, encoding="utf-8") as config_file:
+        formations = json.load(config_file)
+
+    if formation not in formations:
+        raise ValueError(
+            f"Unknown formation '{formation}' in {config_path}. "
+            f"Choose from: {', '.join(formations)}"
+        )
+
+    for position, slots in formations[formation].items():
+        if not isinstance(slots, int) or slots < 1:
+            raise ValueError(
+                f"Position '{position}' in formation '{formation}' "
+                "needs a positive number of slots"
+            )
+
+    criteria["formation"] = formation
+    criteria["slots"] = formations[formation]
+
+
+def get_config_tiers(config, structure):
+    """
+    Check the tiers of a league structure and fill in their leagues and team counts.
+    A tier with "teams" and no "leagues" is one league with the name of the tier.
     """
-    load_dotenv()
+    tiers = []
+
+    for tier in config.get("tiers", []):
+        leagues = tier.get("leagues") or [
+            {"name": tier["name"], "teams": tier["teams"]}
+        ]
 
-    # Check if the edited dataset exists
-    edited_dataset_path = os.getenv("EDITED_DATASET_PATH")
-    edited_male_file_path = os.path.join(edited_dataset_path, "male_players_edited.csv")
+        for league in leagues:
+            if not isinstance(league.get("teams"), int) or league["teams"] < 1:
+                raise ValueError(
+                    f"League '{league.get('name')}' in structure '{structure}' "
+                    "needs a positive number of teams"
+                )
 
-    # Check if the edited file exists
-    if os.path.exists(edited_male_file_path):
-        file_path = edited_male_file_path
-    else:
-        original_dataset_path = os.getenv("ORIGINAL_DATASET_PATH")
-        file_path = os.path.join(original_dataset_path, "male_players.csv")
+        tiers.append(
+            {
+                "name": tier["name"],
+                "leagues": leagues,
+                "teams": sum(league["teams"] for league in leagues),
+            }
+        )
 
-    # Return file path
-    return file_path
+    if not tiers:
+        raise ValueError(f"League structure '{structure}' has no tiers")
 
+    return tiers
 
-def get_unique_positions(datafile):
+
+def get_file_path():
+    """
+    Get the file path of the male dataset: the edited dataset if it exists,
+    else the original one. The choice is made once, see settings.py.
+
+    Returns:
+        str: The path to the dataset file.
+    """
+    return get_settings()["dataset_path"]
+
+
+def get_position_slots(datafile):
     """
-    Get unique positions from the dataset and return them as a list.
-    If "CB" is present, replace it with "CB1" and "CB2".
+    Get the positions of the formation that are found in the dataset, with
+    their number of slots per team, in the order of the board columns.
     """
     # Define the desired order of positions
     desired_order = [
@@ -165,18 +364,31 @@ def get_unique_positions(datafile):
         "RW",
     ]
     # Identify unique positions in the dataset
-    unique_positions = datafile["Position"].unique()
+    unique_positions = set(datafile["Position"].unique())
 
     # Filter unique positions based on the desired order and keep the specified order
-    ordered_positions = [pos for pos in desired_order if pos in unique_positions]
+    return [
+        (position, criteria["slots"][position])
+        for position in desired_order
+        if position in unique_positions and position in criteria["slots"]
+    ]
+
+
+def get_position_columns(position_slots):
+    """
+    Get the board columns of the position slots.
+    A position with one slot keeps its name, a position with more slots
+    gets numbered columns, such as "CB1" and "CB2".
+    """
+    columns = []
 
-    # Check if "CB" is in the list and replace it with "CB1" and "CB2"
-    if "CB" in ordered_positions:
-        # Find the index of "CB" and replace it with "CB1" and "CB2"
-        index = ordered_positions.index("CB")
-        ordered_positions[index : index + 1] = ["CB1", "CB2"]
+    for position, slots in position_slots:
+        if slots == 1:
+            columns.append(position)
+        else:
+            columns.extend(f"{position}{slot + 1}" for slot in range(slots))
 
-    return ordered_positions
+    return columns
 
 
 def print_banner_draft():
@@ -0,0 +1,266 @@
+"""
+This module handles the binary cache of the player datasets.
+A CSV dataset is converted once into typed column files that can be memory-mapped,
+and the cache is rebuilt automatically when the source file changes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from .instrumentation import add_counts
+from .instrumentation import trace_stage
+from .settings import get_settings
+
+CACHE_VERSION = 1
+
+# Columns that are always stored as categories
+CATEGORICAL_COLUMNS = ["Position", "Nation", "Club"]
+
+
+def load_players(file_path):
+    """
+    Load a player dataset through the binary cache.
+    The cache is built on the first load and rebuilt whenever the size,
+    modification time and content hash of the source no longer match.
+
+    Returns:
+        pandas.DataFrame: The dataset with the same columns as the CSV file.
+    """
+    cache_dir = get_cache_dir(file_path)
+
+    with trace_stage("load_players", file_path=file_path) as counters:
+        cache_hit = is_cache_valid(file_path, cache_dir)
+        if not cache_hit:
+            build_cache(file_path, cache_dir)
+            add_counts(counters, bytes_read=os.path.getsize(file_path))
+
+        datafile = read_cache(cache_dir)
+
+        if counters is not None:
+            counters["cache_hit"] = cache_hit
+            add_counts(
+                counters,
+                rows=len(datafile),
+                bytes_read=sum(entry.stat().st_size for entry in os.scandir(cache_dir)),
+            )
+
+    return datafile
+
+
+def get_cache_dir(file_path):
+    """
+    Get the cache directory of a dataset file.
+
+    Returns:
+        str: The path to the cache directory.
+    """
+    cache_path = get_settings()["cache_path"]
+    dataset_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    return os.path.join(cache_path, dataset_name)
+
+
+def get_fingerprint(file_path, with_hash=True):
+    """
+    Get the fingerprint of a dataset file: its size, modification time and hash.
+    """
+    stat = os.stat(file_path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as source_file:
+            for block in iter(lambda: source_file.read(1 << 20), b""):
+                digest.update(block)
+        fingerprint["sha256"] = digest.hexdigest()
+
+    return fingerprint
+
+
+def read_meta(cache_dir):
+    """
+    Read the metadata of a cache, or None if there is no usable cache.
+    """
+    meta_path = os.path.join(cache_dir, "meta.json")
+
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, encoding="utf-8") as meta_file:
+        meta = json.load(meta_file)
+
+    if meta.get("version") != CACHE_VERSION:
+        return None
+
+    return meta
+
+
+def is_cache_valid(file_path, cache_dir):
+    """
+    Check if the cache still matches the source file.
+    Size and modification time are checked first; only when they differ
+    the content hash decides if the cache has to be rebuilt.
+    """
+    meta = read_meta(cache_dir)
+    if meta is None:
+        return False
+
+    cached = meta["fingerprint"]
+    current = get_fingerprint(file_path, with_hash=False)
+
+    if current["size"] != cached["size"]:
+        return False
+    if current["mtime_ns"] == cached["mtime_ns"]:
+        return True
+
+    # The file was touched, compare the content
+    current = get_fingerprint(file_path)
+    if current["sha256"] != cached["sha256"]:
+        return False
+
+    # Same content, remember the new modification time
+    meta["fingerprint"] = current
+    write_meta(cache_dir, meta)
+    return True
+
+
+def write_meta(cache_dir, meta):
+    """
+    Write the metadata of a cache.
+    """
+    meta_path = os.path.join(cache_dir, "meta.json")
+    temp_path = f"{meta_path}.{os.getpid()}.tmp"
+
+    with open(temp_path, "w", encoding="utf-8") as meta_file:
+        json.dump(meta, meta_file, indent=2)
+
+    os.replace(temp_path, meta_path)
+
+
+def build_cache(file_path, cache_dir):
+    """
+    Convert a CSV dataset into typed column files.
+    Text columns become categories (codes plus labels), ratings and other
+    small whole numbers become int8, and every array is saved as a .npy file.
+    Every process builds in a temporary directory of its own, so processes
+    that build the same cache at once never remove each other's files.
+    """
+    datafile = pd.read_csv(file_path)
+
+    temp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+
+    columns = []
+    for index, name in enumerate(datafile.columns):
+        column = datafile[name]
+        file_name = f"{index}.npy"
+
+        if column.dtype == object:
+            # Missing text is kept as a category code of -1
+            if (
+                name in CATEGORICAL_COLUMNS
+                or column.nunique() <= len(column) // 2
+                or column.isna().any()
+            ):
+                categorical = pd.Categorical(column)
+                dtype = get_int_dtype(-1, len(categorical.categories))
+                labels = categorical.categories.to_numpy(dtype=str)
+                np.save(
+                    os.path.join(temp_dir, file_name), categorical.codes.astype(dtype)
+                )
+                np.save(os.path.join(temp_dir, f"{index}_categories.npy"), labels)
+                kind = "category"
+            else:
+                np.save(os.path.join(temp_dir, file_name), column.to_numpy(dtype=str))
+                kind = "string"
+        elif pd.api.types.is_integer_dtype(column):
+            dtype = get_int_dtype(column.min(), column.max())
+            np.save(os.path.join(temp_dir, file_name), column.to_numpy(dtype=dtype))
+            kind = "number"
+        else:
+            np.save(
+                os.path.join(temp_dir, file_name), column.to_numpy(dtype=np.float32)
+            )
+            kind = "number"
+
+        columns.append({"name": name, "kind": kind, "file": file_name})
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": file_path,
+        "rows": len(datafile),
+        "fingerprint": get_fingerprint(file_path),
+        "columns": columns,
+    }
+    write_meta(temp_dir, meta)
+    install_cache(file_path, cache_dir, temp_dir)
+
+
+def install_cache(file_path, cache_dir, temp_dir):
+    """
+    Move a built cache into place. A valid cache that another process
+    installed first is kept, and an old cache is moved aside before it is
+    removed, so readers never see a half-removed cache directory.
+    """
+    if is_cache_valid(file_path, cache_dir):
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return
+
+    old_dir = f"{cache_dir}.{os.getpid()}.old"
+    try:
+        os.replace(cache_dir, old_dir)
+    except FileNotFoundError:
+        pass
+
+    try:
+        os.replace(temp_dir, cache_dir)
+    except OSError:
+        # Another process installed its cache in between
+        if not is_cache_valid(file_path, cache_dir):
+            raise
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def get_int_dtype(minimum, maximum):
+    """
+    Get the smallest integer type that holds all values between minimum and maximum.
+    """
+    for dtype in [np.int8, np.int16, np.int32]:
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            return dtype
+    return np.int64
+
+
+def read_cache(cache_dir):
+    """
+    Read a dataset from its cache.
+    Number columns and category codes are memory-mapped instead of copied.
+    """
+    meta = read_meta(cache_dir)
+
+    data = {}
+    for column in meta["columns"]:
+        values = np.load(os.path.join(cache_dir, column["file"]), mmap_mode="r")
+
+        if column["kind"] == "category":
+            labels = np.load(
+                os.path.join(
+                    cache_dir, column["file"].replace(".npy", "_categories.npy")
+                )
+            )
+            data[column["name"]] = pd.Categorical.from_codes(
+                values, categories=labels.astype(object)
+            )
+        elif column["kind"] == "string":
+            data[column["name"]] = values.astype(object)
+        else:
+            data[column["name"]] = values
+
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,158 @@
+"""
+This module measures the quality and balance of generated drafts.
+It works on integer draft boards, so one draft or a whole batch of drafts
+is analysed with the same NumPy operations.
+"""
+
+import importlib
+import sys
+import numpy as np
+import pandas as pd
+from .dataset_cache import load_players
+from .draft_board import load_draft
+
+
+def compute_draft_analytics(boards, overall, tiers):
+    """
+    Compute the strength and balance of one or many draft boards.
+
+    Args:
+        boards: Player row indices with shape (teams, positions) or
+            (drafts, teams, positions), -1 for an empty slot.
+        overall: Overall rating of every player in the dataset.
+        tiers: Pairs of tier name and number of teams, from the top tier down.
+
+    Returns:
+        dict: With arrays that have the drafts as first axis:
+            - team_average: Average Overall per team (drafts, teams)
+            - position_strength: Average Overall per tier and position
+              (drafts, tiers, positions)
+            - tier_average: Average team strength per tier (drafts, tiers)
+            - tier_spread: Strongest minus weakest team per tier (drafts, tiers)
+            - tier_variance: Variance of the team averages per tier (drafts, tiers)
+            - tier_gini: Gini coefficient of the team averages per tier (drafts, tiers)
+            - summary: DataFrame with the mean of every tier metric over all drafts
+    """
+    boards = np.asarray(boards)
+    if boards.ndim == 2:
+        boards = boards[np.newaxis]
+
+    tier_names = [tier_name for tier_name, _ in tiers]
+    tier_sizes = np.array([number_of_teams for _, number_of_teams in tiers])
+    tier_starts = np.concatenate([[0], np.cumsum(tier_sizes)[:-1]])
+
+    # Ratings of all drafted players, NaN for empty slots
+    overall = np.asarray(overall, dtype=np.float32)
+    filled = boards >= 0
+    ratings = np.where(filled, overall[np.where(filled, boards, 0)], np.nan)
+
+    # Average rating of every team
+    slot_counts = filled.sum(axis=2)
+    team_average = np.nansum(ratings, axis=2) / np.maximum(slot_counts, 1)
+    team_average[slot_counts == 0] = np.nan
+
+    # Sums over the teams of each tier
+    rating_sums = np.add.reduceat(np.nan_to_num(ratings), tier_starts, axis=1)
+    rating_counts = np.add.reduceat(filled, tier_starts, axis=1)
+    position_strength = rating_sums / np.maximum(rating_counts, 1)
+
+    tier_average = np.add.reduceat(team_average, tier_starts, axis=1) / tier_sizes
+    tier_squares = np.add.reduceat(team_average**2, tier_starts, axis=1) / tier_sizes
+    tier_variance = tier_squares - tier_average**2
+    tier_spread = np.maximum.reduceat(
+        team_average, tier_starts, axis=1
+    ) - np.minimum.reduceat(team_average, tier_starts, axis=1)
+
+    tier_gini = np.stack(
+        [
+            compute_gini(team_average[:, start : start + size])
+            for start, size in zip(tier_starts, tier_sizes)
+        ],
+        axis=1,
+    )
+
+    summary = pd.DataFrame(
+        {
+            "Average": tier_average.mean(axis=0),
+            "Spread": tier_spread.mean(axis=0),
+            "Variance": tier_variance.mean(axis=0),
+            "Gini": tier_gini.mean(axis=0),
+        },
+        index=tier_names,
+    )
+
+    return {
+        "team_average": team_average,
+        "position_strength": position_strength,
+        "tier_average": tier_average,
+        "tier_spread": tier_spread,
+        "tier_variance": np.maximum(tier_variance, 0),
+        "tier_gini": tier_gini,
+        "summary": summary,
+    }
+
+
+def compute_gini(values):
+    """
+    Compute the Gini coefficient along the last axis.
+    0 means all teams are equally strong.
+    """
+    sorted_values = np.sort(values, axis=-1)
+    count = sorted_values.shape[-1]
+    ranks = np.arange(1, count + 1)
+
+    totals = sorted_values.sum(axis=-1)
+    weighted = (sorted_values * ranks).sum(axis=-1)
+
+    return (2 * weighted) / (count * np.where(totals == 0, 1, totals)) - (
+        count + 1
+    ) / count
+
+
+def analyze_drafts(file_path=None):
+    """
+    Print the balance of a batch of drafts, or of the last saved draft
+    when no batch file is given.
+
+    Returns:
+        dict: The analytics computed by compute_draft_analytics.
+    """
+    print_banner_draft_analytics()
+
+    if file_path is None:
+        draft_board = load_draft()
+        boards = draft_board["players"]
+        tiers = draft_board["tiers"]
+        dataset = draft_board["dataset"]
+    else:
+        with np.load(file_path) as batch:
+            boards = batch["drafts"]
+            tier_names = np.asarray(batch["tier_names"]).tolist()
+            tiers = list(zip(tier_names, batch["tier_sizes"]))
+            dataset = str(batch["dataset"])
+
+    datafile = load_players(dataset)
+    analytics = compute_draft_analytics(boards, datafile["Overall"].to_numpy(), tiers)
+
+    number_of_drafts = 1 if boards.ndim == 2 else len(boards)
+    print(f"Drafts analysed: {number_of_drafts}\n")
+    print(analytics["summary"].round(3).to_string())
+    print()
+
+    return analytics
+
+
+def print_banner_draft_analytics():
+    """
+    Print a banner for the draft analytics.
+    """
+    width = 40
+
+    print("=" * width)
+    print("Show analysis of drafts".center(width))
+    print("=" * width)
+
+
+if __name__ == "__main__":
+    # The command line of every part of the tool is in main.py
+    importlib.import_module("main").main(["analyze", "--drafts", *sys.argv[1:]])
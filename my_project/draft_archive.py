@@ -0,0 +1,353 @@
+"""
+This module handles the draft archive: an append-only file of draft boards.
+The archive starts with a small header (the board layout: team names, tiers,
+leagues and position columns) followed by fixed-width int32 records, one per
+draft. The records are memory-mapped, so any draft is read by its ID without
+loading the archive, and the whole archive can be scanned with NumPy.
+Next to the archive an index file holds the batch and draft number of every
+record, and a JSON file the seed and criteria of every batch, so every draft
+can be made again.
+
+    drafts.arc        header + records (drafts x teams x position slots)
+    drafts.arc.idx    index: batch and draft number per record
+    drafts.arc.json   batches: seed entropy, mode, pool, score and draft count
+"""
+
+import importlib
+import json
+import os
+import struct
+import sys
+import numpy as np
+import pandas as pd
+from .dataset_cache import load_players
+from .draft_cache import get_dataset_fingerprint
+
+ARCHIVE_MAGIC = b"DRAFTARC"
+ARCHIVE_VERSION = 1
+
+# Magic, version, data offset, teams, position slots and metadata length
+HEADER_FORMAT = "<8sIIIII"
+
+# Records start at a multiple of this many bytes
+HEADER_ALIGNMENT = 64
+
+INDEX_DTYPE = np.dtype([("batch", "<u4"), ("draft_number", "<u8")])
+
+# Board fields stored in the header, they must match for every appended batch
+LAYOUT_FIELDS = [
+    "names",
+    "tiers",
+    "leagues",
+    "positions",
+    "slots",
+    "structure",
+    "extra_number",
+    "formation",
+    "dataset",
+    "fingerprint",
+]
+
+# Drafts written or scanned at once, to bound the memory of an append or scan
+SCAN_CHUNK_SIZE = 10000
+
+
+def get_archive_paths(archive_path):
+    """
+    Get the paths of the records, the index and the batches of an archive.
+    """
+    return archive_path, f"{archive_path}.idx", f"{archive_path}.json"
+
+
+def append_drafts(archive_path, drafts, layout, batch):
+    """
+    Append a batch of drafts to an archive, creating it on the first batch.
+    The records and index rows are written first; the batch only counts once
+    the batches file is replaced, so an interrupted append leaves the archive
+    as it was.
+
+    Args:
+        drafts: Player row indices with shape (drafts, teams, position slots).
+        layout: The board fields of LAYOUT_FIELDS but "fingerprint".
+        batch: JSON-ready details of the batch, such as the seed entropy and mode.
+
+    Returns:
+        range: The draft IDs of the appended drafts.
+    """
+    drafts = np.ascontiguousarray(drafts, dtype=np.int32)
+
+    # Through JSON, so tuples compare equal to the lists read from the header
+    layout = json.loads(
+        json.dumps(
+            {
+                **{name: layout[name] for name in LAYOUT_FIELDS[:-1]},
+                "fingerprint": get_dataset_fingerprint(layout["dataset"]),
+            }
+        )
+    )
+    records_path, index_path, batches_path = get_archive_paths(archive_path)
+
+    if os.path.exists(records_path):
+        archive = open_archive(archive_path)
+        check_layout(archive["layout"], layout, drafts.shape[1:])
+        batches = archive["batches"]
+        first_id = len(archive["drafts"])
+        data_offset = archive["data_offset"]
+    else:
+        batches = []
+        first_id = 0
+        data_offset = write_header(records_path, layout, drafts.shape[1:])
+
+    # Drop records of an append that didn't finish, then write chunk by chunk,
+    # so a memory-mapped batch is never read into memory at once
+    record_size = drafts.shape[1] * drafts.shape[2] * drafts.itemsize
+    with open(records_path, "r+b") as records_file:
+        records_file.truncate(data_offset + first_id * record_size)
+        records_file.seek(0, os.SEEK_END)
+        for start in range(0, len(drafts), SCAN_CHUNK_SIZE):
+            records_file.write(drafts[start : start + SCAN_CHUNK_SIZE].tobytes())
+
+    index = np.zeros(len(drafts), dtype=INDEX_DTYPE)
+    index["batch"] = len(batches)
+    index["draft_number"] = np.arange(len(drafts))
+    with open(index_path, "a+b") as index_file:
+        index_file.truncate(first_id * INDEX_DTYPE.itemsize)
+        index_file.seek(0, os.SEEK_END)
+        index_file.write(index.tobytes())
+
+    batches.append({**batch, "first_id": first_id, "drafts": len(drafts)})
+    temp_path = f"{batches_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as batches_file:
+        json.dump(batches, batches_file, indent=2)
+    os.replace(temp_path, batches_path)
+
+    return range(first_id, first_id + len(drafts))
+
+
+def write_header(records_path, layout, shape):
+    """
+    Create an archive file with only its header.
+
+    Returns:
+        int: The offset of the first record.
+    """
+    meta = json.dumps(layout).encode("utf-8")
+    header_size = struct.calcsize(HEADER_FORMAT) + len(meta)
+    data_offset = -(-header_size // HEADER_ALIGNMENT) * HEADER_ALIGNMENT
+
+    header = struct.pack(
+        HEADER_FORMAT,
+        ARCHIVE_MAGIC,
+        ARCHIVE_VERSION,
+        data_offset,
+        shape[0],
+        shape[1],
+        len(meta),
+    )
+
+    with open(records_path, "wb") as records_file:
+        records_file.write(header + meta)
+        records_file.write(b"\0" * (data_offset - header_size))
+
+    return data_offset
+
+
+def check_layout(archive_layout, layout, shape):
+    """
+    Check that a batch has the board layout of the archive.
+    """
+    archive_shape = (len(archive_layout["names"]), len(archive_layout["positions"]))
+    if tuple(shape) != archive_shape:
+        raise ValueError(
+            f"The drafts have {shape[0]} teams and {shape[1]} position slots, "
+            f"the archive has {archive_shape[0]} and {archive_shape[1]}"
+        )
+
+    different = [name for name in LAYOUT_FIELDS if archive_layout[name] != layout[name]]
+    if different:
+        raise ValueError(
+            f"The drafts don't match the archive in: {', '.join(different)}"
+        )
+
+
+def open_archive(archive_path):
+    """
+    Open an archive for reading. Only the header and the batches are read;
+    the records and the index are memory-mapped.
+
+    Returns:
+        dict: "layout", "batches", "data_offset", "drafts" (drafts, teams,
+            position slots) and "index" (batch and draft number per draft).
+    """
+    records_path, index_path, batches_path = get_archive_paths(archive_path)
+
+    with open(records_path, "rb") as records_file:
+        prefix = records_file.read(struct.calcsize(HEADER_FORMAT))
+        magic, version, data_offset, teams, slots, meta_length = struct.unpack(
+            HEADER_FORMAT, prefix
+        )
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise ValueError(f"{records_path} is not a draft archive of this version")
+        layout = json.loads(records_file.read(meta_length))
+
+    batches = []
+    if os.path.exists(batches_path):
+        with open(batches_path, encoding="utf-8") as batches_file:
+            batches = json.load(batches_file)
+
+    # Only drafts of finished batches count
+    number_of_drafts = sum(batch["drafts"] for batch in batches)
+    shape = (number_of_drafts, teams, slots)
+
+    if number_of_drafts == 0:
+        drafts = np.empty(shape, dtype=np.int32)
+        index = np.empty(0, dtype=INDEX_DTYPE)
+    else:
+        drafts = np.memmap(
+            records_path, dtype=np.int32, mode="r", offset=data_offset, shape=shape
+        )
+        index = np.memmap(
+            index_path, dtype=INDEX_DTYPE, mode="r", shape=(number_of_drafts,)
+        )
+
+    return {
+        "layout": layout,
+        "batches": batches,
+        "data_offset": data_offset,
+        "drafts": drafts,
+        "index": index,
+    }
+
+
+def read_draft(archive, draft_id):
+    """
+    Read one draft of an open archive, without reading the other records.
+
+    Returns:
+        dict: The draft board with the layout, the draft ID and the seed and
+            criteria of its batch.
+    """
+    if not 0 <= draft_id < len(archive["drafts"]):
+        raise ValueError(
+            f"Draft {draft_id} is not in the archive "
+            f"(IDs 0 to {len(archive['drafts']) - 1})"
+        )
+
+    batch = archive["batches"][int(archive["index"][draft_id]["batch"])]
+
+    return {
+        **archive["layout"],
+        "mode": batch.get("mode"),
+        "pool": batch.get("pool"),
+        "score": batch.get("score"),
+        "draft_id": draft_id,
+        "seed_entropy": batch.get("seed_entropy"),
+        "draft_number": int(archive["index"][draft_id]["draft_number"]),
+        "players": np.array(archive["drafts"][draft_id]),
+    }
+
+
+def scan_team_averages(archive, overall):
+    """
+    Compute the average Overall of every team of every draft, chunk by chunk.
+
+    Returns:
+        numpy.ndarray: float32 averages with shape (drafts, teams), NaN for a team
+            without players.
+    """
+    drafts = archive["drafts"]
+    averages = np.empty(drafts.shape[:2], dtype=np.float32)
+
+    # An empty slot (-1) picks the 0 at the end
+    ratings_of = np.append(np.asarray(overall, dtype=np.float32), 0)
+
+    for start in range(0, len(drafts), SCAN_CHUNK_SIZE):
+        chunk = np.asarray(drafts[start : start + SCAN_CHUNK_SIZE])
+        ratings = ratings_of[chunk]
+        counts = np.count_nonzero(chunk >= 0, axis=2)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages[start : start + len(chunk)] = ratings.sum(axis=2) / counts
+
+    return averages
+
+
+def find_drafts(archive, overall, team_name, minimum=None, maximum=None):
+    """
+    Find the drafts in which a team averages between minimum and maximum.
+
+    Returns:
+        numpy.ndarray: The IDs of the matching drafts.
+    """
+    names = archive["layout"]["names"]
+    if team_name not in names:
+        raise ValueError(f"Unknown team '{team_name}'")
+
+    team_average = scan_team_averages(archive, overall)[:, names.index(team_name)]
+
+    matches = ~np.isnan(team_average)
+    if minimum is not None:
+        matches &= team_average > minimum
+    if maximum is not None:
+        matches &= team_average < maximum
+
+    return np.flatnonzero(matches)
+
+
+def show_archive(
+    archive_path, action, draft_id=None, team_name=None, minimum=None, maximum=None
+):
+    """
+    Print the summary of an archive, one draft, or the drafts in which a team
+    averages above a minimum and below a maximum.
+    """
+    archive = open_archive(archive_path)
+    layout = archive["layout"]
+
+    if action == "info":
+        print(f"Drafts: {len(archive['drafts'])}")
+        print(
+            f"Teams: {len(layout['names'])}, position slots: {len(layout['positions'])}"
+        )
+        print(f"Structure: {layout['structure']}, formation: {layout['formation']}")
+        print(f"Dataset: {layout['dataset']}")
+        for number, batch in enumerate(archive["batches"]):
+            print(
+                f"Batch {number}: IDs {batch['first_id']} to "
+                f"{batch['first_id'] + batch['drafts'] - 1}, mode {batch.get('mode')}"
+            )
+        return archive
+
+    if action == "show" and draft_id is None:
+        raise ValueError("Give the ID of the draft to show")
+    if action == "find" and team_name is None:
+        raise ValueError("Give the team to find drafts for with --team")
+
+    datafile = load_players(layout["dataset"])
+
+    if action == "show":
+        draft_board = read_draft(archive, draft_id)
+        players = draft_board["players"]
+        names = datafile["Name"].to_numpy(dtype=object)
+        table = pd.DataFrame(
+            np.where(players >= 0, names[np.maximum(players, 0)], None),
+            index=pd.Index(layout["names"], name="Team"),
+            columns=layout["positions"],
+        )
+        print(
+            f"Draft {draft_id} (batch seed {draft_board['seed_entropy']}, "
+            f"draft number {draft_board['draft_number']})\n"
+        )
+        print(table.to_string())
+        return draft_board
+
+    draft_ids = find_drafts(
+        archive, datafile["Overall"].to_numpy(), team_name, minimum, maximum
+    )
+    print(f"{len(draft_ids)} of {len(archive['drafts'])} drafts match")
+    print(" ".join(str(draft_id) for draft_id in draft_ids[:100]))
+    return draft_ids
+
+
+if __name__ == "__main__":
+    # The command line of every part of the tool is in main.py
+    importlib.import_module("main").main(["archive", *sys.argv[1:]])
@@ -0,0 +1,151 @@
+"""
+This module handles saving, loading and exporting draft boards.
+A draft board holds the team names, the position columns and an int32 matrix
+of player row indices (-1 for an empty slot). Readable player text is only
+rendered when the board is exported to CSV.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from .instrumentation import add_counts
+from .instrumentation import trace_stage
+from .scoring import ATTRIBUTE_COLUMNS
+from .settings import get_leagues_path
+
+
+def get_draft_paths(leagues_path=None):
+    """
+    Get the file paths of the saved draft board.
+
+    Returns:
+        tuple: The paths to the player matrix, the board metadata and the CSV export.
+    """
+    if leagues_path is None:
+        leagues_path = get_leagues_path()
+
+    return (
+        os.path.join(leagues_path, "super_draft.npy"),
+        os.path.join(leagues_path, "super_draft.json"),
+        os.path.join(leagues_path, "super_draft.csv"),
+    )
+
+
+def save_draft(draft_board, leagues_path=None):
+    """
+    Save the draft board as an integer matrix with a small metadata file.
+    Both files are written to a temporary file first and then moved into place,
+    so an interrupted run never leaves a partially written draft behind.
+
+    Returns:
+        str: The path to the saved player matrix.
+    """
+    players_path, meta_path, _ = get_draft_paths(leagues_path)
+
+    with trace_stage("save_draft") as counters:
+        temp_players_path = f"{players_path}.tmp.npy"
+        np.save(temp_players_path, draft_board["players"])
+
+        meta = {
+            "names": draft_board["names"],
+            "tiers": draft_board["tiers"],
+            "leagues": draft_board["leagues"],
+            "structure": draft_board["structure"],
+            "extra_number": draft_board["extra_number"],
+            "formation": draft_board["formation"],
+            "slots": draft_board["slots"],
+            "mode": draft_board["mode"],
+            "pool": draft_board["pool"],
+            "score": draft_board["score"],
+            "positions": draft_board["positions"],
+            "dataset": draft_board["dataset"],
+        }
+        temp_meta_path = f"{meta_path}.tmp"
+        with open(temp_meta_path, "w", encoding="utf-8") as meta_file:
+            json.dump(meta, meta_file, indent=2)
+
+        if counters is not None:
+            add_counts(
+                counters,
+                rows=len(draft_board["players"]),
+                bytes_written=os.path.getsize(temp_players_path)
+                + os.path.getsize(temp_meta_path),
+            )
+
+        os.replace(temp_players_path, players_path)
+        os.replace(temp_meta_path, meta_path)
+
+    return players_path
+
+
+def load_draft(leagues_path=None):
+    """
+    Load the saved draft board.
+
+    Returns:
+        dict: The draft board.
+    """
+    players_path, meta_path, _ = get_draft_paths(leagues_path)
+
+    with open(meta_path, encoding="utf-8") as meta_file:
+        draft_board = json.load(meta_file)
+
+    draft_board["players"] = np.load(players_path)
+
+    return draft_board
+
+
+def render_players(datafile, players):
+    """
+    Render player row indices as readable text, with all dataset columns
+    but the attributes joined by a comma. Every drafted player is rendered only once.
+
+    Returns:
+        numpy.ndarray: Object array with the same shape as players (None for -1).
+    """
+    rendered = np.full(players.shape, None, dtype=object)
+
+    drafted = players >= 0
+    unique_players, inverse = np.unique(players[drafted], return_inverse=True)
+
+    if len(unique_players) > 0:
+        columns = [name for name in datafile.columns if name not in ATTRIBUTE_COLUMNS]
+        rows = datafile[columns].iloc[unique_players]
+        text = rows.iloc[:, 0].astype(str).to_numpy(dtype=object)
+        for name in rows.columns[1:]:
+            text = text + ", " + rows[name].astype(str).to_numpy(dtype=object)
+        rendered[drafted] = text[inverse]
+
+    return rendered
+
+
+def export_draft(draft_board, datafile, leagues_path=None):
+    """
+    Export the draft board to a readable CSV file with the players as text.
+
+    Returns:
+        str: The path to the CSV file.
+    """
+    _, _, output_file_path = get_draft_paths(leagues_path)
+
+    with trace_stage("export_draft") as counters:
+        draft_data = pd.DataFrame(
+            render_players(datafile, draft_board["players"]),
+            columns=draft_board["positions"],
+        )
+        draft_data.insert(0, "Name", draft_board["names"])
+
+        temp_file_path = f"{output_file_path}.tmp"
+        draft_data.to_csv(temp_file_path, index=False)
+
+        if counters is not None:
+            add_counts(
+                counters,
+                rows=len(draft_data),
+                bytes_written=os.path.getsize(temp_file_path),
+            )
+
+        os.replace(temp_file_path, output_file_path)
+
+    return output_file_path
@@ -0,0 +1,213 @@
+"""
+This module handles the cache of finished draft boards.
+A seeded draft always gives the same board, so boards are kept under a key made
+of the dataset fingerprint, the criteria and the seed. The most recently used
+boards are kept in memory (DRAFT_CACHE_SIZE) and, when DRAFT_CACHE_PATH is set,
+on disk as well, where the least recently used files are removed once the
+directory grows over DRAFT_CACHE_DISK_MB.
+"""
+
+import hashlib
+import json
+import operator
+import os
+from collections import OrderedDict
+from contextlib import suppress
+import numpy as np
+from .dataset_cache import get_cache_dir
+from .dataset_cache import read_meta
+from .instrumentation import trace_stage
+from .settings import get_settings
+
+# Boards drafted by another version of the drafters are never used
+DRAFT_CACHE_VERSION = 1
+
+# The boards in memory, least recently used first
+draft_cache_state = {"boards": OrderedDict()}
+
+# Criteria that decide the board, the names are resolved from the configs
+KEY_CRITERIA = [
+    "structure",
+    "extra_number",
+    "tiers",
+    "formation",
+    "slots",
+    "mode",
+    "pool",
+    "score_weights",
+]
+
+
+def get_dataset_fingerprint(file_path):
+    """
+    Get the content hash of a dataset from its binary cache.
+
+    Returns:
+        str: The SHA-256 of the dataset file, or None if it has no cache yet.
+    """
+    meta = read_meta(get_cache_dir(file_path))
+
+    return meta["fingerprint"]["sha256"] if meta else None
+
+
+def get_draft_key(fingerprint, criteria, seed):
+    """
+    Get the cache key of a draft. The criteria are compared by their content,
+    so a changed league or formation config gives a new key.
+
+    Returns:
+        str: The key, or None when the draft can't be cached (no seed or dataset cache).
+    """
+    if seed is None or fingerprint is None:
+        return None
+
+    normalized = json.dumps(
+        {
+            "version": DRAFT_CACHE_VERSION,
+            "dataset": fingerprint,
+            "criteria": {name: criteria[name] for name in KEY_CRITERIA},
+            "seed": operator.index(seed),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def get_cached_draft(key):
+    """
+    Get a cached draft board, from memory or else from disk.
+
+    Returns:
+        dict: A copy of the draft board, or None if it is not cached.
+    """
+    if key is None:
+        return None
+
+    boards = draft_cache_state["boards"]
+
+    with trace_stage("get_cached_draft") as counters:
+        draft_board = boards.get(key)
+        if draft_board is not None:
+            boards.move_to_end(key)
+        else:
+            draft_board = read_disk_draft(key)
+            if draft_board is not None:
+                remember_draft(key, draft_board)
+
+        if counters is not None:
+            counters["cache_hit"] = draft_board is not None
+
+    return copy_draft(draft_board) if draft_board is not None else None
+
+
+def store_draft(key, draft_board):
+    """
+    Keep a finished draft board in the cache.
+    """
+    if key is None:
+        return
+
+    draft_board = copy_draft(draft_board)
+    remember_draft(key, draft_board)
+    write_disk_draft(key, draft_board)
+
+
+def clear_draft_cache():
+    """
+    Remove all draft boards from memory. The disk cache is kept.
+    """
+    draft_cache_state["boards"].clear()
+
+
+def remember_draft(key, draft_board):
+    """
+    Keep a board in memory and drop the least recently used boards over the limit.
+    """
+    boards = draft_cache_state["boards"]
+    boards[key] = draft_board
+    boards.move_to_end(key)
+
+    while len(boards) > get_settings()["draft_cache_size"]:
+        boards.popitem(last=False)
+
+
+def copy_draft(draft_board):
+    """
+    Copy a draft board, so changes to it never reach the cache.
+    """
+    return {**draft_board, "players": draft_board["players"].copy()}
+
+
+def get_disk_path(key):
+    """
+    Get the file of a board in the disk cache, or None when it is switched off.
+    """
+    cache_path = get_settings()["draft_cache_path"]
+
+    return os.path.join(cache_path, f"{key}.npz") if cache_path else None
+
+
+def read_disk_draft(key):
+    """
+    Read a board from the disk cache and mark it as recently used.
+
+    Returns:
+        dict: The draft board, or None if it is not on disk.
+    """
+    disk_path = get_disk_path(key)
+    if disk_path is None or not os.path.exists(disk_path):
+        return None
+
+    try:
+        with np.load(disk_path) as saved_draft:
+            draft_board = json.loads(str(saved_draft["meta"]))
+            draft_board["players"] = saved_draft["players"]
+        os.utime(disk_path)
+    except (OSError, ValueError, KeyError):
+        # A damaged or just removed file is drafted again
+        return None
+
+    return draft_board
+
+
+def write_disk_draft(key, draft_board):
+    """
+    Write a board to the disk cache and keep the directory under its size limit.
+    """
+    disk_path = get_disk_path(key)
+    if disk_path is None:
+        return
+
+    os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+
+    meta = {name: value for name, value in draft_board.items() if name != "players"}
+    temp_path = f"{disk_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as draft_file:
+        np.savez(draft_file, players=draft_board["players"], meta=json.dumps(meta))
+    os.replace(temp_path, disk_path)
+
+    trim_disk_cache(os.path.dirname(disk_path))
+
+
+def trim_disk_cache(cache_path):
+    """
+    Remove the least recently used boards until the disk cache fits its limit.
+    """
+    limit = get_settings()["draft_cache_disk_mb"] * 1024 * 1024
+
+    files = sorted(
+        (entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+        for entry in os.scandir(cache_path)
+        if entry.name.endswith(".npz")
+    )
+    total_size = sum(size for _, size, _ in files)
+
+    for _, size, path in files:
+        if total_size <= limit:
+            break
+        # Another process may have removed the file already
+        with suppress(FileNotFoundError):
+            os.remove(path)
+        total_size -= size
@@ -0,0 +1,681 @@
+"""
+This module checks the invariants of the drafters on many seeded drafts at once.
+Every check works on a batch of draft boards (drafts x teams x position slots),
+so thousands of drafts are checked with a few NumPy operations:
+
+    positions   every player is in a column of its own position, from the pool
+    duplicates  no player (player ID) is drafted twice in a draft
+    filled      a slot is only empty when its position has no players left,
+                and a short tier is never followed by a tier with players
+    tier_order  a tier only gets players that the tiers above it passed over,
+                at most extra_number (plus the spill-over) per tier
+    balance     the balanced mode only moves players between teams of a tier
+    workers     a process pool drafts the same boards as one process
+
+The first drafts of both modes are also drafted again, one random position,
+team and tier per board. A re-drafted board must keep the positions and
+duplicates invariants, only leave a re-drafted slot empty when its position
+has no players left, and only change the cells of the re-drafted position or the
+tier of the re-drafted team or tier. A re-drafted position must also keep
+the tier_order invariant.
+
+Besides the dataset the checks run on small synthetic datasets with few players,
+skewed positions, equal ratings, players listed for several positions and
+players with a row in several seasons, where the drafters run out of players
+and spill over more than one tier.
+"""
+
+import importlib
+import sys
+import numpy as np
+import pandas as pd
+from .create_batch_drafts import generate_drafts
+from .create_super_league import criteria
+from .create_super_league import get_file_path
+from .create_super_league import get_position_slots
+from .create_super_league import set_criteria
+from .create_super_league import set_formation
+from .dataset_cache import load_players
+from .player_pool import get_pool_index
+from .position_index import build_position_index
+from .position_index import get_player_ids
+from .position_index import keep_best_rows
+from .redraft import create_redraft_state
+from .redraft import draft_position_again
+from .redraft import draft_team_again
+from .redraft import draft_tier_again
+
+# Drafts that are checked at once, to bound the memory of the checks
+CHECK_CHUNK_SIZE = 1000
+
+# Drafts of every mode that are drafted again, one board at a time
+REDRAFT_DRAFTS = 20
+
+# Positions the synthetic players are spread over
+SYNTHETIC_POSITIONS = [
+    "GK",
+    "LWB",
+    "LB",
+    "CB",
+    "RB",
+    "RWB",
+    "CDM",
+    "CM",
+    "LM",
+    "CAM",
+    "RM",
+    "LW",
+    "CF",
+    "ST",
+    "RW",
+]
+
+# Synthetic datasets and the league structure they are drafted into.
+# "cb_share" is the share of players that are CB, "shared" the share of rows
+# that belong to a player of an earlier row (a player with several positions),
+# "seasons" the number of seasons every row is repeated for with a new rating
+# (the rows of a player pool, with the same player ID in every season).
+SYNTHETIC_DATASETS = {
+    "tiny": {
+        "players": 120,
+        "cb_share": 0.0,
+        "shared": 0.0,
+        "ratings": (45, 90),
+        "tiers": [2, 2, 3],
+        "extra_number": 3,
+        "formation": "all-positions",
+    },
+    "skewed": {
+        "players": 3000,
+        "cb_share": 0.8,
+        "shared": 0.3,
+        "ratings": (70, 71),
+        "tiers": [4, 6, 8],
+        "extra_number": 10,
+        "formation": "3-5-2",
+    },
+    "spill": {
+        "players": 300,
+        "cb_share": 0.1,
+        "shared": 0.1,
+        "ratings": (50, 80),
+        "tiers": [1, 1, 1, 1],
+        "extra_number": 10,
+        "formation": "4-4-2",
+    },
+    "strict": {
+        "players": 600,
+        "cb_share": 0.2,
+        "shared": 0.2,
+        "ratings": (60, 90),
+        "tiers": [5, 5],
+        "extra_number": 0,
+        "formation": "4-3-3",
+    },
+    "seasons": {
+        "players": 400,
+        "cb_share": 0.1,
+        "shared": 0.1,
+        "ratings": (55, 85),
+        "tiers": [3, 3, 4],
+        "extra_number": 5,
+        "formation": "4-4-2",
+        "seasons": 3,
+    },
+}
+
+CHECKS = [
+    "positions",
+    "duplicates",
+    "filled",
+    "tier_order",
+    "balance",
+    "workers",
+    "redraft_position",
+    "redraft_team",
+    "redraft_tier",
+]
+
+
+def check_invariants(
+    number_of_drafts=1000,
+    seed=None,
+    workers=1,
+    structure=None,
+    formation=None,
+    player_filter=None,
+    score_profile=None,
+    synthetic_only=False,
+):
+    """
+    Draft and check seeded batches of the dataset and of every synthetic dataset,
+    in the random and the balanced mode, and print the drafts that fail a check.
+    The dataset is drafted with the league structure, formation, player filter
+    and score profile of the .env, unless they are given.
+
+    Returns:
+        dict: Dataset name mapped to the failing draft numbers of every check.
+    """
+    # Print Banner
+    print_banner_invariants()
+
+    seed_sequence = np.random.SeedSequence(seed)
+    print(f"Seed entropy: {seed_sequence.entropy}\n")
+
+    saved_criteria = dict(criteria)
+    results = {}
+
+    try:
+        if not synthetic_only:
+            set_criteria(structure, formation, None, player_filter, score_profile)
+            file_path = get_file_path()
+            datafile = load_players(file_path)
+            position_index = get_pool_index(
+                file_path, datafile, criteria["pool"], criteria["score"]
+            )
+            results["dataset"] = check_dataset(
+                datafile, position_index, number_of_drafts, seed_sequence, workers
+            )
+            print_failures("dataset", results["dataset"], number_of_drafts)
+
+        rng = np.random.default_rng(seed_sequence.spawn(1)[0])
+        for name, case in SYNTHETIC_DATASETS.items():
+            set_synthetic_criteria(case)
+            datafile = create_synthetic_dataset(case, rng)
+            results[name] = check_dataset(
+                datafile,
+                get_synthetic_index(datafile),
+                number_of_drafts,
+                seed_sequence,
+                workers,
+            )
+            print_failures(name, results[name], number_of_drafts)
+    finally:
+        criteria.update(saved_criteria)
+
+    failing = sum(
+        len(draft_numbers)
+        for failures in results.values()
+        for draft_numbers in failures.values()
+    )
+    print("All invariants hold.\n" if not failing else f"{failing} failures.\n")
+
+    return results
+
+
+def check_dataset(datafile, position_index, number_of_drafts, seed_sequence, workers):
+    """
+    Draft a seeded batch of a dataset in the random and the balanced mode
+    with the set criteria, and check both batches.
+
+    Returns:
+        dict: Check name mapped to the draft numbers that fail it.
+    """
+    position_slots = get_position_slots(datafile)
+    player_ids = get_player_ids(datafile)
+    overall = datafile["Overall"].to_numpy(dtype=np.int32)
+    mode = criteria["mode"]
+
+    def draft(draft_mode, draft_workers=1):
+        criteria["mode"] = draft_mode
+        return generate_drafts(
+            position_index,
+            position_slots,
+            player_ids,
+            overall,
+            number_of_drafts,
+            seed_sequence.entropy,
+            draft_workers,
+        )
+
+    try:
+        drafts = draft("random")
+        balanced = draft("balanced")
+        pooled = draft("random", workers) if workers > 1 else drafts
+    finally:
+        criteria["mode"] = mode
+
+    failures = {name: np.zeros(number_of_drafts, dtype=bool) for name in CHECKS}
+
+    for start in range(0, number_of_drafts, CHECK_CHUNK_SIZE):
+        stop = min(start + CHECK_CHUNK_SIZE, number_of_drafts)
+
+        for boards in (drafts[start:stop], balanced[start:stop]):
+            for name, failed in check_drafts(
+                boards, position_index, position_slots, player_ids, criteria
+            ).items():
+                failures[name][start:stop] |= failed
+
+        failures["balance"][start:stop] = check_balance(
+            drafts[start:stop], balanced[start:stop], criteria
+        )
+        failures["workers"][start:stop] = (
+            pooled[start:stop] != drafts[start:stop]
+        ).any(axis=(1, 2))
+
+    rng = np.random.default_rng(seed_sequence.entropy)
+    number_of_redrafts = min(number_of_drafts, REDRAFT_DRAFTS)
+    for draft_mode, boards in (("random", drafts), ("balanced", balanced)):
+        for name, failed in check_redrafts(
+            datafile,
+            position_index,
+            boards[:number_of_redrafts],
+            draft_mode,
+            rng,
+        ).items():
+            failures[name][:number_of_redrafts] |= failed
+
+    return {name: np.flatnonzero(failed) for name, failed in failures.items()}
+
+
+def check_redrafts(datafile, position_index, boards, mode, rng):
+    """
+    Draft a random position, team and tier of every board again, each on its
+    own copy of the board, and check the re-drafted boards.
+
+    Returns:
+        dict: "redraft_position", "redraft_team" and "redraft_tier", each a
+            boolean array that is True for the boards that fail a check.
+    """
+    position_slots = get_position_slots(datafile)
+    player_ids = get_player_ids(datafile)
+    tier_names = [tier["name"] for tier in criteria["tiers"]]
+    tier_starts = np.cumsum([0] + [tier["teams"] for tier in criteria["tiers"]])
+    team_tiers = np.repeat(np.arange(len(tier_names)), np.diff(tier_starts))
+    column_starts = np.cumsum([0] + [slots for _, slots in position_slots])
+
+    failures = {
+        name: np.zeros(len(boards), dtype=bool)
+        for name in ("redraft_position", "redraft_team", "redraft_tier")
+    }
+
+    for number, board in enumerate(boards):
+        position_number = rng.integers(len(position_slots))
+        row = rng.integers(len(board))
+        tier = rng.integers(len(tier_names))
+
+        # The cells a re-draft may change; a team trades within its tier
+        first_column = column_starts[position_number]
+        position_columns = slice(
+            first_column, first_column + position_slots[position_number][1]
+        )
+        team_rows = slice(
+            tier_starts[team_tiers[row]], tier_starts[team_tiers[row] + 1]
+        )
+        tier_rows = slice(tier_starts[tier], tier_starts[tier + 1])
+
+        # The re-draft, its target, the cells it may change and the cells it fills
+        redrafts = {
+            "redraft_position": (
+                draft_position_again,
+                position_slots[position_number][0],
+                (slice(None), position_columns),
+                (slice(None), position_columns),
+            ),
+            "redraft_team": (
+                draft_team_again,
+                f"Team {row + 1}",
+                team_rows,
+                (slice(row, row + 1), slice(None)),
+            ),
+            "redraft_tier": (
+                draft_tier_again,
+                tier_names[tier],
+                tier_rows,
+                (tier_rows, slice(None)),
+            ),
+        }
+
+        for name, (redraft, target, cells, filled_cells) in redrafts.items():
+            draft_board = get_redraft_board(board, position_slots, mode)
+            state = create_redraft_state(
+                draft_board, datafile, position_index, seed=rng
+            )
+            redraft(state, target)
+
+            redrafted = draft_board["players"]
+            kept = np.ones(board.shape, dtype=bool)
+            kept[cells] = False
+            checks = check_drafts(
+                redrafted[np.newaxis],
+                position_index,
+                position_slots,
+                player_ids,
+                criteria,
+            )
+            if name != "redraft_position":
+                # The band of a team or tier is widened past the tier order
+                del checks["tier_order"]
+
+            # A re-draft only fills its own cells, and a player it puts back
+            # may have a row at a position that was short already
+            checks["filled"] = [
+                has_empty_slots_left(
+                    redrafted, filled_cells, position_index, position_slots, player_ids
+                )
+            ]
+
+            failures[name][number] = (
+                any(failed[0] for failed in checks.values())
+                or (redrafted[kept] != board[kept]).any()
+            )
+
+    return failures
+
+
+def has_empty_slots_left(board, cells, position_index, position_slots, player_ids):
+    """
+    Check if some cells of a board have an empty slot of a position with
+    players left, players that are nowhere on the board.
+    """
+    ids = np.where(board >= 0, player_ids[np.maximum(board, 0)], -1)
+    ids = np.sort(ids.ravel())[np.newaxis]
+
+    in_cells = np.zeros(board.shape, dtype=bool)
+    in_cells[cells] = True
+    first_column = 0
+
+    for position, slots in position_slots:
+        columns = slice(first_column, first_column + slots)
+        first_column += slots
+        if (board[:, columns][in_cells[:, columns]] < 0).any() and has_players_left(
+            ids, player_ids[position_index[position]]
+        )[0]:
+            return True
+
+    return False
+
+
+def get_redraft_board(board, position_slots, mode):
+    """
+    Get a draft board of a copy of a drafted board with the set criteria,
+    with the fields a re-draft reads.
+
+    Returns:
+        dict: The draft board.
+    """
+    return {
+        "players": np.array(board),
+        "names": [f"Team {row + 1}" for row in range(len(board))],
+        "tiers": [[tier["name"], tier["teams"]] for tier in criteria["tiers"]],
+        "structure": criteria["structure"],
+        "extra_number": criteria["extra_number"],
+        "formation": criteria["formation"],
+        "slots": [[position, slots] for position, slots in position_slots],
+        "mode": mode,
+        "pool": criteria["pool"],
+        "score": criteria["score"],
+    }
+
+
+def check_drafts(drafts, position_index, position_slots, player_ids, draft_criteria):
+    """
+    Check the invariants of a batch of drafts made with the criteria.
+
+    Args:
+        drafts: Player row indices with shape (drafts, teams, position slots).
+        position_index: The position index the drafts were made from.
+        position_slots: Pairs of position and slots per team, as the board columns.
+        player_ids: The player ID of every row of the dataset.
+
+    Returns:
+        dict: "positions", "duplicates", "filled" and "tier_order", each a
+            boolean array that is True for the drafts that fail the check.
+    """
+    drafts = np.asarray(drafts)
+    filled = drafts >= 0
+
+    # The position number and rank in the index of every row, -1 when it is
+    # not in the index; the extra last row is looked up for empty slots
+    number_of_rows = len(player_ids)
+    row_positions = np.full(number_of_rows + 1, -1, dtype=np.int32)
+    row_ranks = np.full(number_of_rows + 1, -1, dtype=np.int64)
+    for number, (position, _) in enumerate(position_slots):
+        indices = position_index[position]
+        row_positions[indices] = number
+        row_ranks[indices] = np.arange(len(indices))
+
+    column_positions = np.repeat(
+        np.arange(len(position_slots)), [slots for _, slots in position_slots]
+    )
+    wrong_position = filled & (row_positions[drafts] != column_positions)
+
+    # Sorted player IDs of every draft, equal neighbours are drafted twice
+    ids = np.where(filled, player_ids[np.maximum(drafts, 0)], -1)
+    ids = np.sort(ids.reshape(len(drafts), -1), axis=1)
+    duplicates = ((ids[:, 1:] == ids[:, :-1]) & (ids[:, 1:] >= 0)).any(axis=1)
+
+    tier_sizes = np.array([tier["teams"] for tier in draft_criteria["tiers"]])
+    tier_starts = np.concatenate([[0], np.cumsum(tier_sizes)[:-1]])
+    tier_ends = np.cumsum(tier_sizes)
+
+    unfilled = np.zeros(len(drafts), dtype=bool)
+    out_of_order = np.zeros(len(drafts), dtype=bool)
+    first_column = 0
+
+    for position, slots in position_slots:
+        block = drafts[:, :, first_column : first_column + slots]
+        block_filled = filled[:, :, first_column : first_column + slots]
+        first_column += slots
+
+        # A tier is short of players only if the position ran out of players
+        counts = np.add.reduceat(block_filled.sum(axis=2), tier_starts, axis=1)
+        short = counts < tier_sizes * slots
+        later_counts = counts[:, ::-1].cumsum(axis=1)[:, ::-1] - counts
+        unfilled |= (short & (later_counts > 0)).any(axis=1)
+
+        short_drafts = np.flatnonzero(short.any(axis=1))
+        if len(short_drafts):
+            unfilled[short_drafts] |= has_players_left(
+                ids[short_drafts], player_ids[position_index[position]]
+            )
+
+        # Rank of every drafted player among the drafted players of the position
+        ranks = np.where(block_filled, row_ranks[block], np.iinfo(np.int64).max)
+        ranks = ranks.reshape(len(drafts), -1)
+        order = np.argsort(ranks, axis=1, kind="stable")
+        drafted_ranks = np.empty_like(order)
+        np.put_along_axis(
+            drafted_ranks, order, np.arange(ranks.shape[1])[np.newaxis], axis=1
+        )
+        drafted_ranks = np.where(
+            block_filled, drafted_ranks.reshape(block.shape), -1
+        ).max(axis=2)
+
+        # The worst player of the tiers up to a tier must be in their bound
+        worst = np.maximum.accumulate(drafted_ranks, axis=1)[:, tier_ends[:-1] - 1]
+        bounds = get_tier_bounds(tier_sizes * slots, draft_criteria["extra_number"])
+        out_of_order |= (worst >= bounds).any(axis=1)
+
+    return {
+        "positions": wrong_position.any(axis=(1, 2)),
+        "duplicates": duplicates,
+        "filled": unfilled,
+        "tier_order": out_of_order,
+    }
+
+
+def has_players_left(sorted_ids, position_ids):
+    """
+    Check which drafts left a player of a position undrafted.
+
+    Args:
+        sorted_ids: The sorted player IDs of every draft, -1 for empty slots.
+        position_ids: The player IDs of the players of the position.
+
+    Returns:
+        numpy.ndarray: True for the drafts with a player of the position left.
+    """
+    if len(position_ids) == 0:
+        return np.zeros(len(sorted_ids), dtype=bool)
+
+    # One column per player ID, the empty slots (-1) mark the extra last column
+    drafted = np.zeros(
+        (len(sorted_ids), max(sorted_ids.max(), position_ids.max()) + 2), dtype=bool
+    )
+    drafted[np.arange(len(sorted_ids))[:, np.newaxis], sorted_ids] = True
+
+    return ~drafted[:, position_ids].all(axis=1)
+
+
+def get_tier_bounds(tier_slots, extra_number):
+    """
+    Get, for every tier but the last, how many players of a position the tiers
+    up to it can reach down the sorted order: their slots plus the players that
+    spill over into the next tier (extra_number, and more when a tier has fewer
+    slots than the players spilled into it).
+
+    Returns:
+        numpy.ndarray: The bound of every tier but the last.
+    """
+    bounds = []
+    placed = 0
+    spill = 0
+
+    for slots in tier_slots[:-1]:
+        placed += slots
+        spill = max(spill - slots, 0) + extra_number
+        bounds.append(placed + spill)
+
+    return np.array(bounds, dtype=np.int64)
+
+
+def check_balance(drafts, balanced, draft_criteria):
+    """
+    Check that the balanced drafts have the players of the random drafts with
+    the same seed in every tier and position slot, only on other teams.
+
+    Returns:
+        numpy.ndarray: True for the drafts that differ.
+    """
+    different = np.zeros(len(drafts), dtype=bool)
+    start = 0
+
+    for tier in draft_criteria["tiers"]:
+        rows = slice(start, start + tier["teams"])
+        start += tier["teams"]
+        different |= (
+            np.sort(drafts[:, rows], axis=1) != np.sort(balanced[:, rows], axis=1)
+        ).any(axis=(1, 2))
+
+    return different
+
+
+def create_synthetic_dataset(case, rng):
+    """
+    Create a synthetic dataset with the players, positions and ratings of a case.
+
+    Returns:
+        pandas.DataFrame: Name, Position, Overall and URL of every row, with
+            Season and Player ID when the case has several seasons.
+    """
+    number_of_rows = case["players"]
+
+    # The CB share of the rows are CB, the others are spread over all positions
+    other_positions = [name for name in SYNTHETIC_POSITIONS if name != "CB"]
+    positions = np.where(
+        rng.random(number_of_rows) < case["cb_share"],
+        "CB",
+        rng.choice(other_positions, number_of_rows),
+    )
+
+    # Shared rows belong to the player of an earlier row
+    owners = np.arange(number_of_rows)
+    shared = np.flatnonzero(rng.random(number_of_rows) < case["shared"])
+    shared = shared[shared > 0]
+    owners[shared] = rng.integers(0, shared)
+
+    low, high = case["ratings"]
+    datafile = pd.DataFrame(
+        {
+            "Name": [f"Player {owner}" for owner in owners],
+            "Position": positions,
+            "Overall": rng.integers(low, high + 1, number_of_rows),
+            "URL": [f"synthetic/{owner}" for owner in owners],
+        }
+    )
+
+    number_of_seasons = case.get("seasons", 1)
+    if number_of_seasons == 1:
+        return datafile
+
+    # Every season repeats the rows with the same player ID and a new rating
+    seasons = []
+    for season in range(number_of_seasons):
+        season_rows = datafile.assign(
+            Overall=rng.integers(low, high + 1, number_of_rows),
+            Season=f"S{season + 1}",
+        )
+        season_rows["Player ID"] = owners
+        seasons.append(season_rows)
+
+    return pd.concat(seasons, ignore_index=True)
+
+
+def get_synthetic_index(datafile):
+    """
+    Build the position index of a synthetic dataset. Like the index of a player
+    pool, a dataset with seasons only keeps the best row of every player.
+
+    Returns:
+        dict: Position name mapped to an int32 array of sorted row indices.
+    """
+    position_index = build_position_index(datafile)
+
+    if "Season" in datafile.columns:
+        position_index = keep_best_rows(position_index, get_player_ids(datafile))
+
+    return position_index
+
+
+def set_synthetic_criteria(case):
+    """
+    Set the league structure and formation of a synthetic case:
+    one league per tier.
+    """
+    criteria["structure"] = "synthetic"
+    criteria["tiers"] = [
+        {
+            "name": f"Tier {number + 1}",
+            "leagues": [{"name": f"Tier {number + 1}", "teams": teams}],
+            "teams": teams,
+        }
+        for number, teams in enumerate(case["tiers"])
+    ]
+    criteria["leagues"] = len(case["tiers"])
+    criteria["extra_number"] = case["extra_number"]
+    criteria["pool"] = ""
+    criteria["score"] = ""
+    criteria["score_weights"] = None
+    set_formation(case["formation"])
+
+
+def print_failures(name, failures, number_of_drafts):
+    """
+    Print the number of drafts that fail every check, and the first of them.
+    """
+    print(f"{name}: {number_of_drafts} drafts")
+
+    for check, draft_numbers in failures.items():
+        line = f"  {check:<18}{len(draft_numbers):>8} failing"
+        if len(draft_numbers):
+            line += f" (first: draft {draft_numbers[0]})"
+        print(line)
+
+    print()
+
+
+def print_banner_invariants():
+    """
+    Print a banner for the invariant checks.
+    """
+    width = 40
+
+    print("=" * width)
+    print("Check Draft Invariants".center(width))
+    print("=" * width)
+
+
+if __name__ == "__main__":
+    # The command line of every part of the tool is in main.py
+    importlib.import_module("main").main(["check", *sys.argv[1:]])
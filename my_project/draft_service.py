@@ -0,0 +1,349 @@
+"""
+This module runs the tool as a long-lived draft service.
+An asyncio server answers HTTP requests on a local TCP port or a Unix socket,
+and the drafts are made in a pool of worker processes that load the dataset,
+its position index and the league configs once and keep them in memory.
+
+    POST /draft  {"seed": 42, "structure": "english", "formation": "4-3-3",
+                  "mode": "balanced", "pool": "gender=F", "names": true}
+    GET  /health
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import signal
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .create_super_league import criteria
+from .create_super_league import draft_players
+from .create_super_league import get_file_path
+from .create_super_league import set_criteria
+from .dataset_cache import load_players
+from .draft_cache import get_cached_draft
+from .draft_cache import get_dataset_fingerprint
+from .draft_cache import get_draft_key
+from .draft_cache import store_draft
+from .player_pool import POOL_CACHE_SIZE
+from .player_pool import get_pool_index
+from .player_pool import keep_recent
+from .position_index import get_player_ids
+
+# Warm dataset and criteria of a worker process, set by init_service_worker
+service_state = {}
+
+# Largest request body the service accepts
+MAX_BODY_SIZE = 64 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+def init_service_worker():
+    """
+    Load the dataset, its position index and player IDs into a worker process.
+    Ctrl+C is left to the server, which stops the workers itself.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    file_path = get_file_path()
+    datafile = load_players(file_path)
+
+    service_state["file_path"] = file_path
+    service_state["fingerprint"] = get_dataset_fingerprint(file_path)
+    service_state["datafile"] = datafile
+    service_state["player_ids"] = get_player_ids(datafile)
+    service_state["names"] = datafile["Name"].to_numpy(dtype=object)
+    service_state["setups"] = OrderedDict()
+
+
+def prepare_service():
+    """
+    Build the dataset cache and the position index of the default criteria
+    in the server process, before the workers start, so the workers only
+    read them instead of all building them at once.
+    """
+    file_path = get_file_path()
+    datafile = load_players(file_path)
+    saved_criteria = dict(criteria)
+
+    try:
+        set_criteria()
+        get_pool_index(file_path, datafile, criteria["pool"], criteria["score"])
+    finally:
+        criteria.update(saved_criteria)
+
+
+def warm_up(_):
+    """
+    An empty task, used to start the worker processes before the first request.
+    """
+    return os.getpid()
+
+
+def encode_draft_request(request):
+    """
+    Make one draft inside a worker process and encode it as JSON there,
+    so the event loop of the server only has to send the bytes.
+
+    Returns:
+        bytes: The JSON body of the response.
+    """
+    return json.dumps(run_draft_request(request)).encode("utf-8")
+
+
+def run_draft_request(request):
+    """
+    Make one draft inside a worker process.
+    The criteria and position index of the most recently used structures,
+    formations, modes, player filters and score profiles are set up once and
+    kept, so a request only drafts the board, or takes it from the draft cache
+    when the same seed was drafted before.
+
+    Returns:
+        dict: The draft as JSON-ready values.
+    """
+    key = (
+        request.get("structure"),
+        request.get("formation"),
+        request.get("mode"),
+        request.get("pool"),
+        request.get("score"),
+    )
+
+    setups = service_state["setups"]
+    if key not in setups:
+        set_criteria(*key)
+        setups[key] = (
+            dict(criteria),
+            get_pool_index(
+                service_state["file_path"],
+                service_state["datafile"],
+                criteria["pool"],
+                criteria["score"],
+            ),
+        )
+
+    setup_criteria, position_index = keep_recent(setups, key, POOL_CACHE_SIZE)
+    criteria.update(setup_criteria)
+
+    seed = request.get("seed")
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2**63))
+
+    cache_key = get_draft_key(service_state["fingerprint"], criteria, seed)
+    draft_board = get_cached_draft(cache_key)
+
+    if draft_board is None:
+        draft_board = draft_players(
+            service_state["datafile"],
+            position_index,
+            service_state["player_ids"],
+            np.random.default_rng(seed),
+        )
+        store_draft(cache_key, draft_board)
+
+    players = draft_board["players"]
+
+    response = {
+        "seed": seed,
+        "structure": draft_board["structure"],
+        "formation": draft_board["formation"],
+        "mode": draft_board["mode"],
+        "pool": draft_board["pool"],
+        "score": draft_board["score"],
+        "dataset": service_state["file_path"],
+        "names": draft_board["names"],
+        "tiers": draft_board["tiers"],
+        "leagues": draft_board["leagues"],
+        "positions": draft_board["positions"],
+        "players": players.tolist(),
+    }
+
+    if request.get("names"):
+        player_names = np.where(
+            players >= 0, service_state["names"][np.maximum(players, 0)], None
+        )
+        response["player_names"] = player_names.tolist()
+
+    return response
+
+
+async def handle_connection(reader, writer, executor):
+    """
+    Answer the HTTP requests of one connection until the client closes it.
+    """
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                break
+
+            status, body = await route_request(request, executor)
+
+            # The body of a too large request is not read, so the connection
+            # can't be used for the next request
+            keep_alive = (
+                request["body"] is not None
+                and request["headers"].get("connection", "").lower() != "close"
+            )
+            write_response(writer, status, body, keep_alive)
+            await writer.drain()
+
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        # A closed connection or a malformed request ends the connection
+        pass
+    finally:
+        writer.close()
+
+
+async def read_request(reader):
+    """
+    Read one HTTP request.
+
+    Returns:
+        dict: The method, path, headers and body, or None when the connection closed.
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_SIZE:
+        return {"method": method, "path": path, "headers": headers, "body": None}
+
+    body = await reader.readexactly(length) if length else b""
+
+    return {"method": method, "path": path, "headers": headers, "body": body}
+
+
+async def route_request(request, executor):
+    """
+    Answer a request.
+
+    Returns:
+        tuple: The HTTP status and the body, as encoded JSON or JSON-ready values.
+    """
+    if request["path"] == "/health":
+        return 200, {"status": "ok"}
+
+    if request["path"] != "/draft":
+        return 404, {"error": f"Unknown path: {request['path']}"}
+
+    if request["method"] != "POST":
+        return 405, {"error": "Use POST for /draft"}
+
+    if request["body"] is None:
+        return 413, {"error": "Request body too large"}
+
+    try:
+        draft_request = json.loads(request["body"] or b"{}")
+    except ValueError:
+        return 400, {"error": "The request body is not valid JSON"}
+
+    if not isinstance(draft_request, dict):
+        return 400, {"error": "The request body must be a JSON object"}
+
+    loop = asyncio.get_running_loop()
+    try:
+        return 200, await loop.run_in_executor(
+            executor, encode_draft_request, draft_request
+        )
+    except (ValueError, TypeError) as error:
+        return 400, {"error": str(error)}
+    except Exception as error:  # pylint: disable=broad-except
+        return 500, {"error": str(error)}
+
+
+def write_response(writer, status, body, keep_alive):
+    """
+    Write an HTTP response with a JSON body.
+    """
+    payload = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    headers = (
+        f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(headers.encode("latin-1") + payload)
+
+
+async def serve(host="127.0.0.1", port=8765, unix_path=None, workers=None):
+    """
+    Start the worker pool and serve draft requests until the process gets
+    SIGINT or SIGTERM; then the server is closed and the workers are stopped.
+    """
+    # Print Banner
+    print_banner_service()
+
+    workers = workers or os.cpu_count() or 1
+    prepare_service()
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signal_number in [signal.SIGINT, signal.SIGTERM]:
+        loop.add_signal_handler(signal_number, stop.set)
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_service_worker
+    ) as executor:
+        # Start every worker now, so the first requests find a warm dataset
+        await asyncio.gather(
+            *(loop.run_in_executor(executor, warm_up, None) for _ in range(workers))
+        )
+
+        def handler(reader, writer):
+            return handle_connection(reader, writer, executor)
+
+        if unix_path:
+            server = await asyncio.start_unix_server(handler, path=unix_path)
+            address = unix_path
+        else:
+            server = await asyncio.start_server(handler, host, port)
+            address = f"http://{host}:{port}"
+
+        print(f"Draft service with {workers} workers listening on {address}\n")
+
+        async with server:
+            await stop.wait()
+
+    if unix_path and os.path.exists(unix_path):
+        os.remove(unix_path)
+
+
+def print_banner_service():
+    """
+    Print a banner for the draft service.
+    """
+    width = 40
+
+    print("=" * width)
+    print("Draft Service".center(width))
+    print("=" * width)
+
+
+if __name__ == "__main__":
+    # The command line of every part of the tool is in main.py
+    importlib.import_module("main").main(["serve", *sys.argv[1:]])
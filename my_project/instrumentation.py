@@ -0,0 +1,183 @@
+"""
+This module handles the opt-in timing of the draft pipeline.
+Every stage records its wall time and counters (rows touched, bytes read and
+written, random draws) as JSON lines or as a Chrome trace.
+Tracing is switched on with the DRAFT_TRACE environment variable or enable_tracing;
+when it is off a stage costs one dictionary lookup.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextlib import nullcontext
+
+# Tracing configuration; "owner" is the process that writes the Chrome trace
+trace_state = {
+    "enabled": False,
+    "format": "jsonl",
+    "path": None,
+    "owner": None,
+    "lock": threading.Lock(),
+}
+
+# Tells worker processes started with DRAFT_TRACE which process owns the trace
+TRACE_OWNER_VARIABLE = "DRAFT_TRACE_OWNER"
+
+# Returned by trace_stage when tracing is off
+DISABLED_STAGE = nullcontext()
+
+
+def enable_tracing(path, trace_format="jsonl"):
+    """
+    Start recording stages to a file.
+    With "jsonl" every stage is appended as one JSON line when it ends;
+    with "chrome" every process appends its stages to its own part file
+    ({path}.{pid}) when they end, and disable_tracing in the process that
+    enabled tracing (or its exit) merges the parts into one Chrome trace,
+    which can be opened in chrome://tracing or Perfetto. Pool workers never
+    run exit handlers, so their stages are written as they end.
+    """
+    if trace_format not in ["jsonl", "chrome"]:
+        raise ValueError(f"Unknown trace format: {trace_format}")
+
+    owner = int(os.getenv(TRACE_OWNER_VARIABLE, str(os.getpid())))
+    if owner == os.getpid():
+        os.environ[TRACE_OWNER_VARIABLE] = str(owner)
+        if trace_format == "chrome":
+            remove_trace_parts(path)
+
+    trace_state["path"] = path
+    trace_state["format"] = trace_format
+    trace_state["owner"] = owner
+    trace_state["enabled"] = True
+
+
+def disable_tracing():
+    """
+    Stop recording stages. In the process that owns a Chrome trace, merge the
+    part files of all processes into the trace.
+    """
+    if not trace_state["enabled"]:
+        return
+
+    trace_state["enabled"] = False
+
+    if trace_state["format"] == "chrome" and trace_state["owner"] == os.getpid():
+        path = trace_state["path"]
+        events = []
+        for part_path in get_trace_parts(path):
+            with open(part_path, encoding="utf-8") as part_file:
+                events.extend(json.loads(line) for line in part_file if line.strip())
+
+        events.sort(key=lambda event: event["ts"])
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": events}, trace_file)
+
+        remove_trace_parts(path)
+        os.environ.pop(TRACE_OWNER_VARIABLE, None)
+
+
+def get_trace_parts(path):
+    """
+    Get the part files of a Chrome trace: one per process, named {path}.{pid}.
+    """
+    return sorted(
+        part_path
+        for part_path in glob.glob(f"{glob.escape(path)}.*")
+        if part_path[len(path) + 1 :].isdigit()
+    )
+
+
+def remove_trace_parts(path):
+    """
+    Remove the part files of a Chrome trace.
+    """
+    for part_path in get_trace_parts(path):
+        os.remove(part_path)
+
+
+def trace_stage(name, **fields):
+    """
+    Time a stage of the pipeline.
+    Used as a context manager; when tracing is on it gives a dictionary of
+    counters the stage can fill in, when tracing is off it gives None.
+    """
+    if not trace_state["enabled"]:
+        return DISABLED_STAGE
+
+    return record_stage(name, fields)
+
+
+def add_counts(counters, **counts):
+    """
+    Add counts to the counters of a traced stage. Does nothing when counters is None.
+    """
+    if counters is None:
+        return
+
+    for key, value in counts.items():
+        counters[key] = counters.get(key, 0) + int(value)
+
+
+@contextmanager
+def record_stage(name, fields):
+    """
+    Record one stage with its fields and counters.
+    """
+    counters = {}
+    start_time = time.perf_counter()
+
+    try:
+        yield counters
+    finally:
+        duration = time.perf_counter() - start_time
+        write_event(name, start_time, duration, {**fields, **counters})
+
+
+def write_event(name, start_time, duration, args):
+    """
+    Write one recorded stage in the configured format.
+    """
+    with trace_state["lock"]:
+        if trace_state["format"] == "chrome":
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": start_time * 1e6,
+                "dur": duration * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            path = f"{trace_state['path']}.{os.getpid()}"
+        else:
+            event = {
+                "stage": name,
+                "start": start_time,
+                "seconds": duration,
+                "pid": os.getpid(),
+                **args,
+            }
+            path = trace_state["path"]
+
+        with open(path, "a", encoding="utf-8") as trace_file:
+            trace_file.write(json.dumps(event, default=str) + "\n")
+
+
+def enable_tracing_from_env():
+    """
+    Enable tracing when DRAFT_TRACE holds a file path.
+    DRAFT_TRACE_FORMAT chooses between "jsonl" (default) and "chrome".
+    """
+    path = os.getenv("DRAFT_TRACE")
+
+    if path:
+        enable_tracing(path, os.getenv("DRAFT_TRACE_FORMAT", "jsonl"))
+
+
+enable_tracing_from_env()
+atexit.register(disable_tracing)
@@ -0,0 +1,214 @@
+"""
+This module handles filtering the player pool.
+The pool dataset (see create_own_dataset.create_player_pool) holds the players
+of several sources and seasons in one table. A filter such as
+"gender=F;season=FC24" is checked directly on the cached column files, and the
+position index of the whole pool is narrowed to the matching rows, so drafting
+from a part of the pool never parses or copies the dataset again.
+The index can also be ranked by a score profile instead of Overall.
+"""
+
+import os
+from collections import OrderedDict
+import numpy as np
+from .dataset_cache import get_cache_dir
+from .dataset_cache import read_meta
+from .position_index import get_player_ids
+from .position_index import get_position_index
+from .position_index import keep_best_rows
+from .scoring import SCORE_CACHE_SIZE
+from .scoring import get_scores
+from .scoring import sort_by_score
+
+# Row masks and filtered position indexes per dataset and filter, least
+# recently used first
+pool_state = {"masks": OrderedDict(), "indexes": OrderedDict()}
+
+# Filters (and score profiles) whose masks and indexes are kept
+POOL_CACHE_SIZE = SCORE_CACHE_SIZE
+
+
+def normalize_filter(player_filter):
+    """
+    Turn a filter into its normal text form: "column=value,value;column=value"
+    with the columns and values sorted. An empty filter selects every player.
+
+    Args:
+        player_filter (str or dict): "gender=F;season=FC24,FC25", or a dictionary
+            of column names mapped to a value or a list of values.
+
+    Returns:
+        str: The normalized filter.
+    """
+    if not player_filter:
+        return ""
+
+    if isinstance(player_filter, str):
+        conditions = {}
+        for condition in player_filter.split(";"):
+            if not condition.strip():
+                continue
+            column, separator, values = condition.partition("=")
+            if not separator or not column.strip() or not values.strip():
+                raise ValueError(
+                    f"Invalid player filter '{condition}', use column=value[,value]"
+                )
+            conditions[column.strip().lower()] = values.split(",")
+    else:
+        conditions = {
+            str(column).lower(): values if isinstance(values, list) else [values]
+            for column, values in player_filter.items()
+        }
+
+    return ";".join(
+        f"{column}={','.join(sorted({str(value).strip() for value in values}))}"
+        for column, values in sorted(conditions.items())
+    )
+
+
+def parse_filter(player_filter):
+    """
+    Get the conditions of a normalized filter.
+
+    Returns:
+        dict: Lowercase column name mapped to the list of allowed values.
+    """
+    conditions = {}
+
+    for condition in normalize_filter(player_filter).split(";"):
+        if condition:
+            column, _, values = condition.partition("=")
+            conditions[column] = values.split(",")
+
+    return conditions
+
+
+def get_filter_mask(file_path, player_filter):
+    """
+    Get the rows of a cached dataset that match a filter.
+    Only the columns of the filter are read from the cache, and category
+    columns are compared by their codes.
+
+    Returns:
+        numpy.ndarray: Boolean mask over the rows, or None for an empty filter.
+    """
+    player_filter = normalize_filter(player_filter)
+    if not player_filter:
+        return None
+
+    cache_dir = get_cache_dir(file_path)
+    meta = read_meta(cache_dir)
+    key = (meta["fingerprint"]["sha256"], player_filter)
+
+    if key not in pool_state["masks"]:
+        columns = {column["name"].lower(): column for column in meta["columns"]}
+        mask = np.ones(meta["rows"], dtype=bool)
+
+        for name, values in parse_filter(player_filter).items():
+            if name not in columns:
+                raise ValueError(
+                    f"Unknown filter column '{name}'. "
+                    f"Choose from: {', '.join(column['name'] for column in meta['columns'])}"
+                )
+            mask &= match_column(cache_dir, columns[name], values)
+
+        pool_state["masks"][key] = mask
+
+    return keep_recent(pool_state["masks"], key, POOL_CACHE_SIZE)
+
+
+def match_column(cache_dir, column, values):
+    """
+    Check which rows of one cached column hold one of the values.
+
+    Returns:
+        numpy.ndarray: Boolean mask over the rows.
+    """
+    data = np.load(os.path.join(cache_dir, column["file"]), mmap_mode="r")
+
+    if column["kind"] == "category":
+        labels = np.load(
+            os.path.join(cache_dir, column["file"].replace(".npy", "_categories.npy"))
+        )
+        codes = np.flatnonzero(np.isin(labels, values))
+        return np.isin(data, codes)
+
+    if column["kind"] == "string":
+        return np.isin(data, values)
+
+    try:
+        numbers = np.array(values, dtype=np.float64)
+    except ValueError as error:
+        raise ValueError(
+            f"Filter column '{column['name']}' needs numbers, got {', '.join(values)}"
+        ) from error
+
+    return np.isin(data, numbers)
+
+
+def get_pool_index(file_path, datafile, player_filter, score_profile=""):
+    """
+    Get the position index of the players that match a filter.
+    Every position keeps its players sorted by rating, or by their score for
+    the position with a score profile, and the row indices still point into
+    the whole dataset. A player with rows of several seasons keeps only the
+    best row among the seasons that match the filter.
+
+    Returns:
+        dict: Position name mapped to an int32 array of sorted row indices.
+    """
+    player_filter = normalize_filter(player_filter)
+    has_seasons = "Season" in datafile.columns
+    if not player_filter and not score_profile and not has_seasons:
+        return get_position_index(file_path, datafile)
+
+    fingerprint = read_meta(get_cache_dir(file_path))["fingerprint"]["sha256"]
+
+    # The profile is keyed by its content, so an edited profile is sorted again
+    profile_hash = ""
+    if score_profile:
+        scores, positions, profile_hash = get_scores(
+            fingerprint, datafile, score_profile
+        )
+
+    key = (fingerprint, player_filter, score_profile, profile_hash)
+
+    if key not in pool_state["indexes"]:
+        position_index = get_position_index(file_path, datafile)
+
+        if player_filter:
+            mask = get_filter_mask(file_path, player_filter)
+            if not mask.any():
+                raise ValueError(
+                    f"No players match the player filter '{player_filter}'"
+                )
+            position_index = {
+                position: indices[mask[indices]]
+                for position, indices in position_index.items()
+            }
+
+        if score_profile:
+            position_index = sort_by_score(position_index, scores, positions)
+
+        if has_seasons:
+            position_index = keep_best_rows(position_index, get_player_ids(datafile))
+
+        pool_state["indexes"][key] = position_index
+
+    return keep_recent(pool_state["indexes"], key, POOL_CACHE_SIZE)
+
+
+def keep_recent(entries, key, size):
+    """
+    Mark an entry of an ordered cache as the most recently used, and drop the
+    least recently used entries over the size.
+
+    Returns:
+        The value of the entry.
+    """
+    entries.move_to_end(key)
+
+    while len(entries) > size:
+        entries.popitem(last=False)
+
+    return entries[key]
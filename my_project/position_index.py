@@ -0,0 +1,155 @@
+"""
+This module handles the position index of a player dataset.
+The index holds, for every position, the row indices of its players sorted by
+Overall rating, so drafters can take the best players with a simple slice.
+Rows of the same player (same EA player ID or URL) get one player ID, which
+the drafters use to draft every player at most once.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from .dataset_cache import get_cache_dir
+from .dataset_cache import read_meta
+from .instrumentation import trace_stage
+
+# Saved indexes of another version are rebuilt
+INDEX_VERSION = 2
+
+
+def get_position_index(file_path, datafile):
+    """
+    Get the position index of a dataset.
+    The index is saved next to the dataset cache and only rebuilt
+    when the cache was built from a different source file.
+
+    Returns:
+        dict: Position name mapped to an int32 array of sorted row indices.
+    """
+    cache_dir = get_cache_dir(file_path)
+    index_path = os.path.join(cache_dir, "position_index.npz")
+
+    meta = read_meta(cache_dir)
+    fingerprint = meta["fingerprint"]["sha256"] if meta else ""
+
+    # Use the saved index if it belongs to the cached dataset
+    if os.path.exists(index_path):
+        with np.load(index_path) as saved_index:
+            if (
+                str(saved_index["fingerprint"]) == fingerprint
+                and int(saved_index.get("version", 1)) == INDEX_VERSION
+            ):
+                return unpack_position_index(saved_index)
+
+    with trace_stage("build_position_index", rows=len(datafile)):
+        position_index = build_position_index(datafile)
+
+    if meta is not None:
+        save_position_index(index_path, position_index, fingerprint)
+
+    return position_index
+
+
+def build_position_index(datafile):
+    """
+    Build the position index of a dataset.
+    Players are sorted by Overall rating, highest first.
+    Players with the same rating keep their order in the dataset.
+    A player listed more than once for a position only keeps the best row
+    (per season, so a player pool can still be filtered on the season).
+    """
+    order = np.argsort(-datafile["Overall"].to_numpy(dtype=np.int16), kind="stable")
+    positions = np.asarray(datafile["Position"], dtype=object)[order]
+    player_keys = get_player_ids(datafile).astype(np.int64)
+
+    if "Season" in datafile.columns:
+        seasons, season_names = pd.factorize(datafile["Season"])
+        player_keys = player_keys * (len(season_names) + 1) + seasons + 1
+
+    position_index = {}
+    for position in sorted(set(positions)):
+        rows = order[positions == position]
+
+        # np.unique gives the first, so best, row of every player
+        _, first = np.unique(player_keys[rows], return_index=True)
+        position_index[position] = rows[np.sort(first)].astype(np.int32)
+
+    return position_index
+
+
+def keep_best_rows(position_index, player_ids):
+    """
+    Keep only the first, so best, row of every player in every position.
+    The index of a player pool holds a player once per season; once the pool
+    is filtered on the seasons to draft, a player must only be drafted once.
+
+    Returns:
+        dict: Position name mapped to an int32 array of sorted row indices.
+    """
+    best_rows = {}
+
+    for position, indices in position_index.items():
+        _, first = np.unique(player_ids[indices], return_index=True)
+        best_rows[position] = indices[np.sort(first)]
+
+    return best_rows
+
+
+def get_player_ids(datafile):
+    """
+    Get the player ID of every row of a dataset.
+    Rows with the same EA player ID (the "Player ID" column of a player pool,
+    -1 when unknown) or else the same URL belong to the same player; without
+    these columns every row is its own player.
+
+    Returns:
+        numpy.ndarray: int32 player IDs from 0 up to the number of players.
+    """
+    if "Player ID" in datafile.columns:
+        ea_ids = datafile["Player ID"].to_numpy()
+        codes, _ = pd.factorize(ea_ids)
+        codes[ea_ids < 0] = -1
+    elif "URL" in datafile.columns:
+        codes, _ = pd.factorize(datafile["URL"])
+    else:
+        return np.arange(len(datafile), dtype=np.int32)
+
+    # Rows without an ID or URL are their own player
+    missing = codes < 0
+    codes[missing] = codes.max(initial=-1) + 1 + np.arange(missing.sum())
+
+    return codes.astype(np.int32)
+
+
+def save_position_index(index_path, position_index, fingerprint):
+    """
+    Save the position index as one array of row indices with offsets per position.
+    Every process writes its own temporary file, so processes that save the
+    same index at once don't overwrite each other's half-written file.
+    """
+    position_names = list(position_index)
+    offsets = np.cumsum([0] + [len(position_index[name]) for name in position_names])
+
+    temp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        temp_path,
+        positions=np.array(position_names),
+        offsets=offsets,
+        indices=np.concatenate([position_index[name] for name in position_names]),
+        fingerprint=np.array(fingerprint),
+        version=np.array(INDEX_VERSION),
+    )
+    os.replace(temp_path, index_path)
+
+
+def unpack_position_index(saved_index):
+    """
+    Turn a saved position index back into a dictionary.
+    """
+    offsets = saved_index["offsets"]
+    indices = saved_index["indices"]
+
+    return {
+        str(name): indices[offsets[i] : offsets[i + 1]]
+        for i, name in enumerate(saved_index["positions"])
+    }
@@ -0,0 +1,422 @@
+"""
+This module handles re-drafting part of a saved draft board.
+One position, one team or one tier is drafted again while the rest of the board
+stays as it is. The dataset cache, the position index and the saved board are
+reused. The board is changed in memory and only saved, in one atomic step,
+once the re-draft has finished.
+"""
+
+import importlib
+import sys
+import numpy as np
+from .balance_teams import balance_block
+from .balance_teams import balance_slots
+from .create_players import create_availability
+from .create_players import draft_position
+from .create_players import get_tier_rows
+from .dataset_cache import load_players
+from .draft_board import export_draft
+from .draft_board import load_draft
+from .draft_board import save_draft
+from .instrumentation import add_counts
+from .instrumentation import trace_stage
+from .player_pool import get_pool_index
+from .position_index import get_player_ids
+
+
+def redraft_position(position, seed=None, leagues_path=None, export=True):
+    """
+    Draft all slots of one position again, for every team of the saved board.
+
+    Returns:
+        dict: The updated draft board.
+    """
+    state = open_redraft(seed, leagues_path)
+    draft_position_again(state, position)
+
+    return finish_redraft(state, leagues_path, export)
+
+
+def draft_position_again(state, position):
+    """
+    Draft all slots of one position of the board in a re-draft state again.
+    The players of the position are put back and drafted over the tiers like
+    in a new draft; players elsewhere on the board stay where they are.
+    """
+    draft_board = state["draft_board"]
+    first_column, slots = get_slot_columns(draft_board, position)
+    columns = slice(first_column, first_column + slots)
+
+    with trace_stage("redraft_position", position=position) as counters:
+        players = np.array(draft_board["players"][:, columns])
+        release_players(state, players)
+        players.fill(-1)
+
+        draft_position(
+            state["position_index"][position],
+            state["criteria"],
+            (0, slots),
+            players,
+            state["rng"],
+            state["availability"],
+            counters,
+        )
+
+        if state["criteria"]["mode"] == "balanced":
+            balance_position(state, players, columns)
+
+        draft_board["players"][:, columns] = players
+        add_counts(counters, cells=players.size)
+
+
+def redraft_team(team_name, seed=None, leagues_path=None, export=True):
+    """
+    Draft the players of one team of the saved board again.
+
+    Returns:
+        dict: The updated draft board.
+    """
+    state = open_redraft(seed, leagues_path)
+    draft_team_again(state, team_name)
+
+    return finish_redraft(state, leagues_path, export)
+
+
+def draft_team_again(state, team_name):
+    """
+    Draft the players of one team of the board in a re-draft state again.
+    Every slot gets a random player from the rating band of the team's tier for
+    that position: a player no one drafted, or a player of another team of the
+    tier, who then gets one of the team's old players in exchange.
+    """
+    draft_board = state["draft_board"]
+
+    if team_name not in draft_board["names"]:
+        raise ValueError(f"Unknown team '{team_name}'")
+
+    row = draft_board["names"].index(team_name)
+
+    with trace_stage("redraft_team", team=team_name) as counters:
+        redraft_rows(state, row, row + 1)
+        add_counts(counters, cells=draft_board["players"].shape[1])
+
+
+def redraft_tier(tier_name, seed=None, leagues_path=None, export=True):
+    """
+    Draft the players of all teams of one tier of the saved board again.
+
+    Returns:
+        dict: The updated draft board.
+    """
+    state = open_redraft(seed, leagues_path)
+    draft_tier_again(state, tier_name)
+
+    return finish_redraft(state, leagues_path, export)
+
+
+def draft_tier_again(state, tier_name):
+    """
+    Draft the players of all teams of one tier of the board in a re-draft state
+    again, from the rating band of the tier for every position, widened by
+    extra_number players on both sides. In the balanced mode the tier is
+    balanced again.
+    """
+    draft_board = state["draft_board"]
+    tier_names = [tier_name for tier_name, _ in draft_board["tiers"]]
+
+    if tier_name not in tier_names:
+        raise ValueError(
+            f"Unknown tier '{tier_name}'. Choose from: {', '.join(tier_names)}"
+        )
+
+    start, number_of_teams = get_tier_rows(state["criteria"])[
+        tier_names.index(tier_name)
+    ]
+
+    with trace_stage("redraft_tier", tier=tier_name) as counters:
+        block = redraft_rows(state, start, start + number_of_teams)
+
+        if state["criteria"]["mode"] == "balanced":
+            balance_block(block, state["overall"], state["rng"])
+            draft_board["players"][start : start + number_of_teams] = block
+
+        add_counts(counters, cells=block.size)
+
+
+def open_redraft(seed, leagues_path):
+    """
+    Open the saved draft board for a re-draft.
+    The player matrix is read into memory, so a re-draft that fails halfway
+    leaves the saved board as it was.
+
+    Returns:
+        dict: The re-draft state of the board.
+    """
+    draft_board = load_draft(leagues_path)
+
+    if "slots" not in draft_board:
+        raise ValueError(
+            "The saved draft has no position slots, create a new draft first"
+        )
+
+    # Boards saved before the player pool and score profiles drafted everyone
+    draft_board.setdefault("pool", "")
+    draft_board.setdefault("score", "")
+
+    datafile = load_players(draft_board["dataset"])
+    board_criteria = get_board_criteria(draft_board)
+    position_index = get_pool_index(
+        draft_board["dataset"],
+        datafile,
+        board_criteria["pool"],
+        board_criteria["score"],
+    )
+
+    return create_redraft_state(draft_board, datafile, position_index, seed)
+
+
+def create_redraft_state(draft_board, datafile, position_index, seed=None):
+    """
+    Create the state to re-draft a board drafted from a dataset and its
+    position index. Every player on the board is marked as taken.
+
+    Returns:
+        dict: The board, its criteria, the dataset arrays and the generator.
+    """
+    player_ids = get_player_ids(datafile)
+
+    available = create_availability(player_ids)
+    drafted = draft_board["players"][draft_board["players"] >= 0]
+    available[player_ids[drafted]] = False
+
+    return {
+        "draft_board": draft_board,
+        "datafile": datafile,
+        "criteria": get_board_criteria(draft_board),
+        "position_index": position_index,
+        "overall": datafile["Overall"].to_numpy(),
+        "availability": (player_ids, available),
+        "rng": np.random.default_rng(seed),
+    }
+
+
+def get_board_criteria(draft_board):
+    """
+    Get the criteria a saved board was drafted with.
+    """
+    return {
+        "structure": draft_board["structure"],
+        "extra_number": draft_board["extra_number"],
+        "tiers": [
+            {"name": tier_name, "teams": number_of_teams}
+            for tier_name, number_of_teams in draft_board["tiers"]
+        ],
+        "formation": draft_board["formation"],
+        "mode": draft_board["mode"],
+        "pool": draft_board.get("pool", ""),
+        "score": draft_board.get("score", ""),
+    }
+
+
+def get_slot_columns(draft_board, position):
+    """
+    Get the first board column and the number of slots of a position.
+    """
+    column = 0
+
+    for slot_position, slots in draft_board["slots"]:
+        if slot_position == position:
+            return column, slots
+        column += slots
+
+    positions = [slot_position for slot_position, _ in draft_board["slots"]]
+    raise ValueError(
+        f"Unknown position '{position}'. Choose from: {', '.join(positions)}"
+    )
+
+
+def redraft_rows(state, start, stop):
+    """
+    Draft the board rows start up to stop again, position by position.
+    The rows must belong to one tier. For every position the new players come
+    from the rating band of the tier, widened by extra_number players on both
+    sides: the available players in that band, and (when only part of the tier
+    is drafted again) the players of the other teams of the tier, who get one
+    of the old players of the rows in exchange. Every cell gets a random
+    player of these, so a team can get players that were drafted by no one or
+    by another team of its tier.
+
+    Returns:
+        numpy.ndarray: The new players of the rows.
+    """
+    draft_board = state["draft_board"]
+    board = draft_board["players"]
+    extra_number = state["criteria"]["extra_number"]
+
+    tier_start, number_of_teams = find_tier(state["criteria"], start)
+    tier_rows = np.arange(tier_start, tier_start + number_of_teams)
+    other_rows = tier_rows[(tier_rows < start) | (tier_rows >= stop)]
+
+    block = np.array(board[start:stop])
+    release_players(state, block)
+
+    column = 0
+    for position, slots in draft_board["slots"]:
+        columns = slice(column, column + slots)
+        column += slots
+
+        # The rating band of the tier for this position, widened on both sides
+        sorted_indices = state["position_index"][position]
+        tier_players = board[tier_start : tier_start + number_of_teams, columns]
+        tier_players = tier_players[tier_players >= 0]
+        if len(tier_players) == 0:
+            continue
+
+        ranks = get_ranks(sorted_indices, tier_players)
+        band = sorted_indices[
+            max(ranks.min() - extra_number, 0) : ranks.max() + 1 + extra_number
+        ]
+
+        cells = block[:, columns]
+        new_cells = np.full(cells.size, -1, dtype=block.dtype)
+        chosen = draw_players(state, band, cells, board[other_rows, columns])
+
+        # Band players drafted at another position of the rows (a row of the
+        # same player) are made up for by the best players left of the position
+        if len(chosen) < cells.size:
+            player_ids, available = state["availability"]
+            left = sorted_indices[available[player_ids[sorted_indices]]]
+            left = left[: cells.size - len(chosen)]
+            available[player_ids[left]] = False
+            chosen = np.concatenate([chosen, left])
+
+        new_cells[: len(chosen)] = chosen
+        block[:, columns] = new_cells.reshape(cells.shape)
+
+        # The other teams get the old players they were exchanged for
+        board[other_rows, columns] = state["exchanged"]
+
+    board[start:stop] = block
+
+    return block
+
+
+def draw_players(state, band, cells, other_cells):
+    """
+    Draw the new players for the cells of one position.
+    The candidates are the available players of the band (including the old
+    players of the cells, which were released) and the players in the other
+    cells; taking one of the latter puts an old player of the cells that was
+    not drawn in its place. The other cells with their exchanges are left in
+    state["exchanged"].
+
+    Returns:
+        numpy.ndarray: The drawn players, at most one per cell.
+    """
+    player_ids, available = state["availability"]
+    rng = state["rng"]
+
+    old_players = cells[cells >= 0]
+    band = band[available[player_ids[band]]]
+    other_cells = np.array(other_cells)
+    other_players = other_cells.ravel()
+
+    # Candidates: (player, index of the other cell or -1 for an available player)
+    candidates = np.concatenate([band, other_players[other_players >= 0]])
+    sources = np.concatenate(
+        [np.full(len(band), -1), np.flatnonzero(other_players >= 0)]
+    )
+
+    # An old player drafted again at another position of the rows (a row of
+    # the same player) can't be exchanged
+    chosen = []
+    exchange = list(rng.permutation(old_players[available[player_ids[old_players]]]))
+
+    for candidate in rng.permutation(len(candidates)):
+        if len(chosen) == cells.size:
+            break
+
+        player, source = candidates[candidate], sources[candidate]
+        if source < 0:
+            if player in old_players and player not in exchange:
+                # Already given to another team in an exchange
+                continue
+            if player in exchange:
+                exchange.remove(player)
+            chosen.append(player)
+            available[player_ids[player]] = False
+        elif exchange:
+            other_players[source] = exchange.pop()
+            available[player_ids[other_players[source]]] = False
+            chosen.append(player)
+
+    state["exchanged"] = other_players.reshape(other_cells.shape)
+
+    return np.array(chosen, dtype=cells.dtype)
+
+
+def find_tier(criteria, row):
+    """
+    Get the first row and the number of teams of the tier a board row belongs to.
+    """
+    for start, number_of_teams in get_tier_rows(criteria):
+        if start <= row < start + number_of_teams:
+            return start, number_of_teams
+
+    raise ValueError(f"Row {row} is not on the board")
+
+
+def get_ranks(sorted_indices, rows):
+    """
+    Get the rank of dataset rows in the sorted indices of a position.
+    """
+    order = np.argsort(sorted_indices, kind="stable")
+    positions = np.searchsorted(sorted_indices, rows, sorter=order)
+
+    return order[positions]
+
+
+def release_players(state, players):
+    """
+    Mark the players of the cells that are drafted again as available.
+    """
+    player_ids, available = state["availability"]
+    available[player_ids[players[players >= 0]]] = True
+
+
+def balance_position(state, players, columns):
+    """
+    Balance the new players of a position over the teams of every tier,
+    keeping the other positions as they are.
+    """
+    board = np.array(state["draft_board"]["players"])
+    board[:, columns] = players
+    slots = list(range(columns.start, columns.stop))
+
+    for start, number_of_teams in get_tier_rows(state["criteria"]):
+        block = board[start : start + number_of_teams]
+        balance_slots(block, state["overall"], slots, state["rng"])
+        players[start : start + number_of_teams] = block[:, columns]
+
+
+def finish_redraft(state, leagues_path, export):
+    """
+    Save the re-drafted board and export it to CSV if asked.
+    The board is saved through temporary files, like a new draft.
+
+    Returns:
+        dict: The updated draft board.
+    """
+    draft_board = state["draft_board"]
+    save_draft(draft_board, leagues_path)
+
+    if export:
+        output_file_path = export_draft(draft_board, state["datafile"], leagues_path)
+        print(f"Super draft CSV file saved at: {output_file_path}\n")
+
+    return draft_board
+
+
+if __name__ == "__main__":
+    # The command line of every part of the tool is in main.py
+    importlib.import_module("main").main(["redraft", *sys.argv[1:]])
@@ -0,0 +1,188 @@
+"""
+This module handles scoring players on their attributes.
+A score profile gives, per position, weights for the attribute columns (Pace,
+Passing, Composure, ...). The scores of every player for every position are one
+matrix multiply of the attribute matrix with the weight matrix of the profile,
+and drafters can rank the players of a position by these scores instead of
+their Overall rating.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+import numpy as np
+from .settings import get_settings
+
+# Attribute columns of the EA datasets that can be weighted, besides Overall.
+# For goalkeepers the six main columns hold their goalkeeping ratings.
+ATTRIBUTE_COLUMNS = [
+    "Pace",
+    "Shooting",
+    "Passing",
+    "Dribbling",
+    "Defending",
+    "Physicality",
+    "Acceleration",
+    "Sprint",
+    "Positioning",
+    "Finishing",
+    "Shot",
+    "Long",
+    "Volleys",
+    "Penalties",
+    "Vision",
+    "Crossing",
+    "Free",
+    "Curve",
+    "Agility",
+    "Balance",
+    "Reactions",
+    "Ball",
+    "Composure",
+    "Interceptions",
+    "Heading",
+    "Def",
+    "Standing",
+    "Sliding",
+    "Jumping",
+    "Stamina",
+    "Strength",
+    "Aggression",
+    "Weak foot",
+    "Skill moves",
+]
+
+# Score matrices per dataset and profile, least recently used first
+scoring_state = {"scores": OrderedDict()}
+
+# Score profiles whose score matrices are kept
+SCORE_CACHE_SIZE = 16
+
+
+def load_score_profile(profile_name):
+    """
+    Load a score profile from the JSON file in SCORE_PROFILE_CONFIG_PATH
+    (default config/score_profiles.json). A profile maps positions to attribute
+    weights; positions it doesn't name use its "default" weights, or Overall.
+
+    Returns:
+        dict: Position name (or "default") mapped to attribute weights.
+    """
+    config_path = get_settings()["score_profile_config_path"]
+
+    with open(config_path, encoding="utf-8") as config_file:
+        profiles = json.load(config_file)
+
+    if profile_name not in profiles:
+        raise ValueError(
+            f"Unknown score profile '{profile_name}' in {config_path}. "
+            f"Choose from: {', '.join(profiles)}"
+        )
+
+    profile = profiles[profile_name]
+
+    for position, weights in profile.items():
+        unknown = set(weights) - set(ATTRIBUTE_COLUMNS) - {"Overall"}
+        if unknown:
+            raise ValueError(
+                f"Unknown attributes for '{position}' in score profile "
+                f"'{profile_name}': {', '.join(sorted(unknown))}"
+            )
+        if sum(weights.values()) <= 0:
+            raise ValueError(
+                f"The weights for '{position}' in score profile '{profile_name}' "
+                "must add up to more than 0"
+            )
+
+    return profile
+
+
+def get_attribute_matrix(datafile, attributes):
+    """
+    Get the attributes of every player as one float32 matrix.
+    Missing values count as 0.
+
+    Returns:
+        numpy.ndarray: Matrix with one row per player and one column per attribute.
+    """
+    missing = [name for name in attributes if name not in datafile.columns]
+    if missing:
+        raise ValueError(
+            f"The dataset has no {', '.join(missing)} column, "
+            "create the edited dataset again to keep the attributes"
+        )
+
+    matrix = np.empty((len(datafile), len(attributes)), dtype=np.float32)
+    for column, name in enumerate(attributes):
+        matrix[:, column] = datafile[name].to_numpy(dtype=np.float32)
+
+    return np.nan_to_num(matrix, copy=False)
+
+
+def get_weight_matrix(profile, attributes, positions):
+    """
+    Get the weights of a profile as a matrix with one row per attribute and
+    one column per position. Every column adds up to 1, so a score is on the
+    same scale as the ratings.
+    """
+    weights = np.zeros((len(attributes), len(positions)), dtype=np.float32)
+    default = profile.get("default", {"Overall": 1})
+
+    for column, position in enumerate(positions):
+        for name, weight in profile.get(position, default).items():
+            weights[attributes.index(name), column] = weight
+
+    return weights / weights.sum(axis=0)
+
+
+def get_scores(fingerprint, datafile, profile_name):
+    """
+    Score every player for every position of the dataset with a profile.
+    The scores are kept per dataset fingerprint and profile content, so a
+    changed profile is scored again.
+
+    Returns:
+        tuple: The float32 score matrix (players x positions), the position
+            names and the hash of the profile content.
+    """
+    profile = load_score_profile(profile_name)
+    profile_hash = hashlib.sha256(
+        json.dumps(profile, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    key = (fingerprint, profile_name, profile_hash)
+
+    if key not in scoring_state["scores"]:
+        attributes = ["Overall"] + sorted(
+            {name for weights in profile.values() for name in weights} - {"Overall"},
+            key=ATTRIBUTE_COLUMNS.index,
+        )
+        positions = sorted(set(np.asarray(datafile["Position"], dtype=object)))
+
+        scores = get_attribute_matrix(datafile, attributes) @ get_weight_matrix(
+            profile, attributes, positions
+        )
+        scoring_state["scores"][key] = (scores, positions)
+
+    entries = scoring_state["scores"]
+    entries.move_to_end(key)
+    while len(entries) > SCORE_CACHE_SIZE:
+        entries.popitem(last=False)
+
+    return (*entries[key], profile_hash)
+
+
+def sort_by_score(position_index, scores, positions):
+    """
+    Sort the players of every position by their score for that position,
+    highest first. Players with the same score keep their order.
+
+    Returns:
+        dict: Position name mapped to an int32 array of sorted row indices.
+    """
+    scored_index = {}
+
+    for position, indices in position_index.items():
+        position_scores = scores[indices, positions.index(position)]
+        scored_index[position] = indices[np.argsort(-position_scores, kind="stable")]
+
+    return scored_index
@@ -0,0 +1,185 @@
+"""
+This module handles the settings of the tool.
+The .env file and the environment are read once, the paths are checked and the
+dataset to use is chosen, and the result is kept for the rest of the process.
+Call refresh_settings after changing the environment or the datasets on disk,
+and override_settings to use other values, for example in tests.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# The resolved settings, filled on first use by get_settings
+settings_state = {"settings": {}, "leagues_path_created": None}
+
+# Environment variables with their setting name and default value
+ENVIRONMENT_SETTINGS = {
+    "ORIGINAL_DATASET_PATH": ("original_dataset_path", "dataset/original"),
+    "EDITED_DATASET_PATH": ("edited_dataset_path", "dataset/edited"),
+    "CACHE_PATH": ("cache_path", "dataset/cache"),
+    "LEAGUES_PATH": ("leagues_path", "league_output"),
+    "LEAGUE_CONFIG_PATH": ("league_config_path", "config/leagues.json"),
+    "LEAGUE_STRUCTURE": ("league_structure", "english"),
+    "FORMATION_CONFIG_PATH": ("formation_config_path", "config/formations.json"),
+    "FORMATION": ("formation", "all-positions"),
+    "DRAFT_MODE": ("draft_mode", "random"),
+    "PLAYER_POOL_CONFIG_PATH": ("player_pool_config_path", "config/player_pool.json"),
+    "PLAYER_FILTER": ("player_filter", ""),
+    "SCORE_PROFILE_CONFIG_PATH": (
+        "score_profile_config_path",
+        "config/score_profiles.json",
+    ),
+    "SCORE_PROFILE": ("score_profile", ""),
+    "DRAFT_CACHE_SIZE": ("draft_cache_size", "128"),
+    "DRAFT_CACHE_PATH": ("draft_cache_path", ""),
+    "DRAFT_CACHE_DISK_MB": ("draft_cache_disk_mb", "256"),
+}
+
+# Player filter of the player pool when PLAYER_FILTER is empty: the men,
+# like the male datasets the pool replaces
+DEFAULT_POOL_FILTER = "gender=M"
+
+# Settings that hold a path
+PATH_SETTINGS = [
+    "original_dataset_path",
+    "edited_dataset_path",
+    "cache_path",
+    "leagues_path",
+    "league_config_path",
+    "formation_config_path",
+    "player_pool_config_path",
+    "score_profile_config_path",
+    "draft_cache_path",
+]
+
+# Settings that hold a whole number
+NUMBER_SETTINGS = ["draft_cache_size", "draft_cache_disk_mb"]
+
+
+def get_settings():
+    """
+    Get the settings, resolving them on the first call.
+
+    Returns:
+        dict: The settings, see load_settings.
+    """
+    if not settings_state["settings"]:
+        settings_state["settings"] = load_settings()
+
+    return settings_state["settings"]
+
+
+def refresh_settings():
+    """
+    Resolve the settings again, for example after a new dataset was created.
+
+    Returns:
+        dict: The new settings.
+    """
+    settings_state["settings"] = load_settings()
+
+    return settings_state["settings"]
+
+
+def override_settings(**values):
+    """
+    Replace some settings with the given values, keeping the others.
+    Changing a dataset directory also chooses the dataset again.
+
+    Returns:
+        dict: The new settings.
+    """
+    unknown = set(values) - set(get_settings())
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+    settings = {**get_settings(), **values}
+
+    if "dataset_path" not in values and (
+        "original_dataset_path" in values or "edited_dataset_path" in values
+    ):
+        settings["dataset_path"] = choose_dataset(settings)
+
+    settings_state["settings"] = settings
+
+    return settings
+
+
+def load_settings():
+    """
+    Read the settings from the .env file and the environment.
+    Variables that are not set get their default value.
+
+    Returns:
+        dict: The setting names from ENVIRONMENT_SETTINGS, with the paths
+        normalized, plus "dataset_path": the dataset to use.
+    """
+    load_dotenv()
+
+    settings = {}
+    for variable, (name, default) in ENVIRONMENT_SETTINGS.items():
+        settings[name] = os.getenv(variable) or default
+
+    # An empty path switches the feature off
+    for name in PATH_SETTINGS:
+        if settings[name]:
+            settings[name] = os.path.normpath(settings[name])
+
+    for name in NUMBER_SETTINGS:
+        settings[name] = int(settings[name])
+
+    if os.path.isfile(settings["leagues_path"]):
+        raise ValueError(
+            f"LEAGUES_PATH must be a directory, not a file: {settings['leagues_path']}"
+        )
+
+    settings["dataset_path"] = choose_dataset(settings)
+
+    return settings
+
+
+def choose_dataset(settings):
+    """
+    Choose the dataset: the player pool if it was created, else the edited male
+    dataset if it exists, else the original male dataset.
+
+    Returns:
+        str: The path to the dataset file.
+    """
+    pool_file_path = os.path.join(settings["edited_dataset_path"], "player_pool.csv")
+
+    if os.path.exists(pool_file_path):
+        return pool_file_path
+
+    edited_file_path = os.path.join(
+        settings["edited_dataset_path"], "male_players_edited.csv"
+    )
+
+    if os.path.exists(edited_file_path):
+        return edited_file_path
+
+    return os.path.join(settings["original_dataset_path"], "male_players.csv")
+
+
+def get_default_filter(settings):
+    """
+    Get the player filter to use when none is given: the men of the player
+    pool, or no filter for the male datasets.
+    """
+    if os.path.basename(settings["dataset_path"]) == "player_pool.csv":
+        return DEFAULT_POOL_FILTER
+
+    return ""
+
+
+def get_leagues_path():
+    """
+    Get the output directory of the drafts, creating it on first use.
+    """
+    leagues_path = get_settings()["leagues_path"]
+
+    if settings_state["leagues_path_created"] != leagues_path:
+        os.makedirs(leagues_path, exist_ok=True)
+        settings_state["leagues_path_created"] = leagues_path
+
+    return leagues_path
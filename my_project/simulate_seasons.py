@@ -0,0 +1,456 @@
+"""
+This module simulates how the leagues of a draft would play out.
+Every team gets an attack and a defence rating from the Overall of its players
+per position, and every league plays a double round robin. The goals of all
+matches of many seasons are drawn at once from Poisson distributions, the tables
+are sums over the fixtures, and at the end of a season the best teams of a tier
+are promoted and the worst relegated.
+"""
+
+import importlib
+import os
+import sys
+import numpy as np
+import pandas as pd
+from .dataset_cache import load_players
+from .draft_board import load_draft
+from .instrumentation import add_counts
+from .instrumentation import trace_stage
+from .settings import get_leagues_path
+
+# Line of every position; midfielders count for attack and defence
+POSITION_LINES = {
+    "GK": "defence",
+    "CB": "defence",
+    "LB": "defence",
+    "RB": "defence",
+    "LWB": "defence",
+    "RWB": "defence",
+    "CDM": "midfield",
+    "CM": "midfield",
+    "CAM": "midfield",
+    "LM": "midfield",
+    "RM": "midfield",
+    "LW": "attack",
+    "RW": "attack",
+    "CF": "attack",
+    "ST": "attack",
+}
+
+# Goal model: expected goals of a team in an even match, the change per
+# rating point between its attack and the opponent's defence, and the home advantage
+BASE_GOALS = 1.35
+RATING_EFFECT = 0.08
+HOME_ADVANTAGE = 0.25
+
+# Rating of a team without players in a line
+EMPTY_RATING = 40.0
+
+# Teams promoted and relegated between two tiers
+PROMOTION_SPOTS = 3
+
+# Seasons simulated at once, to bound the memory of the match arrays
+BATCH_SIZE = 500
+
+
+def simulate_seasons(
+    number_of_seasons=1000, years=1, seed=None, spots=PROMOTION_SPOTS, export=True
+):
+    """
+    Simulate the last saved draft and print how every team does.
+    With more than one year every run is a career: the teams move between
+    the tiers by promotion and relegation and play the next season there.
+
+    Returns:
+        pandas.DataFrame: The results of every team, see summarize_seasons.
+    """
+    print_banner_simulation()
+
+    draft_board = load_draft()
+    datafile = load_players(draft_board["dataset"])
+    attack, defence = get_team_strengths(
+        draft_board["players"], draft_board["slots"], datafile["Overall"].to_numpy()
+    )
+
+    results = run_simulation(
+        attack,
+        defence,
+        draft_board["leagues"],
+        number_of_seasons,
+        years,
+        np.random.default_rng(seed),
+        spots,
+    )
+    summary = summarize_seasons(results, draft_board, years)
+
+    print(f"Seasons simulated: {number_of_seasons} x {years} year(s)\n")
+    for league_name, league_summary in summary.groupby("League", sort=False):
+        print(league_name)
+        print(league_summary.drop(columns=["League", "Tier"]).round(2).to_string())
+        print()
+
+    if export:
+        output_file_path = os.path.join(get_leagues_path(), "season_simulation.csv")
+        summary.to_csv(output_file_path)
+        print(f"Simulation saved at: {output_file_path}\n")
+
+    return summary
+
+
+def get_team_strengths(players, slots, overall):
+    """
+    Get the attack and defence rating of every team: the average Overall of its
+    attackers and midfielders, and of its defenders, goalkeeper and midfielders.
+
+    Returns:
+        tuple: float32 arrays with the attack and defence of every team.
+    """
+    line_of_column = np.array(
+        [
+            POSITION_LINES.get(position, "midfield")
+            for position, number_of_slots in slots
+            for _ in range(number_of_slots)
+        ]
+    )
+
+    filled = players >= 0
+    ratings = np.where(filled, overall[np.where(filled, players, 0)], 0).astype(
+        np.float32
+    )
+
+    return (
+        get_line_strength(
+            ratings, filled & np.isin(line_of_column, ["attack", "midfield"])
+        ),
+        get_line_strength(
+            ratings, filled & np.isin(line_of_column, ["defence", "midfield"])
+        ),
+    )
+
+
+def get_line_strength(ratings, in_line):
+    """
+    Get the average rating of the players of every team in some lines,
+    or EMPTY_RATING for a team without any.
+
+    Returns:
+        numpy.ndarray: float32 strength of every team.
+    """
+    counts = in_line.sum(axis=1)
+    totals = np.where(in_line, ratings, 0).sum(axis=1)
+
+    return np.where(counts > 0, totals / np.maximum(counts, 1), EMPTY_RATING).astype(
+        np.float32
+    )
+
+
+def create_fixtures(leagues):
+    """
+    Create the fixtures of a double round robin in every league: every team
+    plays every other team of its league once at home and once away.
+    Teams are the board rows, which are ordered by league.
+
+    Returns:
+        tuple: The home and away team of every fixture.
+    """
+    home = []
+    away = []
+    start = 0
+
+    for _, number_of_teams, _ in leagues:
+        teams = np.arange(start, start + number_of_teams)
+        pairs = ~np.eye(number_of_teams, dtype=bool)
+        home_index, away_index = np.nonzero(pairs)
+        home.append(teams[home_index])
+        away.append(teams[away_index])
+        start += number_of_teams
+
+    return np.concatenate(home), np.concatenate(away)
+
+
+def run_simulation(attack, defence, leagues, number_of_seasons, years, rng, spots):
+    """
+    Simulate seasons in batches. Every run starts from the draft; with more than
+    one year the teams are promoted and relegated between the seasons of a run.
+
+    Returns:
+        dict: Per team (runs, teams) arrays of the first season: "points",
+            "goal_difference", "position", "promoted" and "relegated",
+            and "final_tier", the tier of every team after the last season.
+    """
+    if number_of_seasons < 1 or years < 1:
+        raise ValueError(
+            f"Simulate at least 1 season of 1 year, not {number_of_seasons} "
+            f"seasons of {years} years"
+        )
+
+    number_of_teams = len(attack)
+    home, away = create_fixtures(leagues)
+    home_matrix = get_incidence_matrix(home, number_of_teams)
+    away_matrix = get_incidence_matrix(away, number_of_teams)
+
+    league_starts = np.cumsum([0] + [league[1] for league in leagues])
+    tier_of_slot = np.repeat([league[2] for league in leagues], np.diff(league_starts))
+
+    batches = []
+    with trace_stage(
+        "simulate_seasons", seasons=number_of_seasons, years=years
+    ) as counters:
+        for start in range(0, number_of_seasons, BATCH_SIZE):
+            runs = min(BATCH_SIZE, number_of_seasons - start)
+
+            # The team that plays in every league slot, per run
+            slot_team = np.tile(np.arange(number_of_teams), (runs, 1))
+
+            first_season = {}
+            for year in range(years):
+                tables = play_season(
+                    attack[slot_team],
+                    defence[slot_team],
+                    home,
+                    away,
+                    home_matrix,
+                    away_matrix,
+                    rng,
+                )
+                positions = get_league_positions(tables, league_starts, rng)
+                promoted, relegated = get_promotions(
+                    tables, positions, tier_of_slot, spots, rng
+                )
+
+                if year == 0:
+                    first_season = {
+                        "points": tables["points"],
+                        "goal_difference": tables["goals_for"]
+                        - tables["goals_against"],
+                        "position": positions,
+                        "promoted": promoted,
+                        "relegated": relegated,
+                    }
+
+                slot_team = move_teams(slot_team, promoted, relegated)
+
+            # In the first season every slot held its own team; the final
+            # tier is read from the slot every team ends in
+            final_tier = np.empty_like(slot_team)
+            np.put_along_axis(final_tier, slot_team, tier_of_slot[np.newaxis], axis=1)
+            batches.append({**first_season, "final_tier": final_tier})
+
+        add_counts(counters, rng_draws=2 * len(home) * number_of_seasons * years)
+
+    return {
+        name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]
+    }
+
+
+def get_incidence_matrix(teams, number_of_teams):
+    """
+    Get a fixtures x teams matrix with a 1 for the team of every fixture,
+    so sums over the fixtures of every team are one matrix multiply.
+    """
+    matrix = np.zeros((len(teams), number_of_teams), dtype=np.float32)
+    matrix[np.arange(len(teams)), teams] = 1
+
+    return matrix
+
+
+def play_season(attack, defence, home, away, home_matrix, away_matrix, rng):
+    """
+    Play all fixtures of a batch of seasons at once.
+
+    Args:
+        attack, defence: Ratings of the team in every slot, (runs, teams).
+
+    Returns:
+        dict: (runs, teams) float32 arrays with "won", "drawn", "lost",
+            "goals_for", "goals_against" and "points" of every slot.
+    """
+    home_rate = BASE_GOALS * np.exp(
+        RATING_EFFECT * (attack[:, home] - defence[:, away]) + HOME_ADVANTAGE / 2
+    )
+    away_rate = BASE_GOALS * np.exp(
+        RATING_EFFECT * (attack[:, away] - defence[:, home]) - HOME_ADVANTAGE / 2
+    )
+
+    home_goals = rng.poisson(home_rate).astype(np.float32)
+    away_goals = rng.poisson(away_rate).astype(np.float32)
+
+    home_win = (home_goals > away_goals).astype(np.float32)
+    away_win = (away_goals > home_goals).astype(np.float32)
+    draw = 1 - home_win - away_win
+
+    won = home_win @ home_matrix + away_win @ away_matrix
+    drawn = draw @ home_matrix + draw @ away_matrix
+    played = home_matrix.sum(axis=0) + away_matrix.sum(axis=0)
+
+    return {
+        "won": won,
+        "drawn": drawn,
+        "lost": played - won - drawn,
+        "goals_for": home_goals @ home_matrix + away_goals @ away_matrix,
+        "goals_against": away_goals @ home_matrix + home_goals @ away_matrix,
+        "points": 3 * won + drawn,
+    }
+
+
+def get_league_positions(tables, league_starts, rng):
+    """
+    Rank the teams of every league by points, goal difference and goals
+    scored; teams that are level on all three are ordered at random.
+
+    Returns:
+        numpy.ndarray: The position of every slot in its league, 0 for the champion.
+    """
+    points = tables["points"]
+    goal_difference = tables["goals_for"] - tables["goals_against"]
+    tiebreak = rng.random(points.shape)
+
+    positions = np.empty(points.shape, dtype=np.int32)
+    for start, stop in zip(league_starts[:-1], league_starts[1:]):
+        league = slice(start, stop)
+        order = np.lexsort(
+            (
+                tiebreak[:, league],
+                -tables["goals_for"][:, league],
+                -goal_difference[:, league],
+                -points[:, league],
+            ),
+            axis=-1,
+        )
+        np.put_along_axis(
+            positions[:, league],
+            order,
+            np.arange(stop - start, dtype=np.int32)[np.newaxis],
+            axis=1,
+        )
+
+    return positions
+
+
+def get_promotions(tables, positions, tier_of_slot, spots, rng):
+    """
+    Find the teams that go up and down between every pair of tiers.
+    The teams of a tier are ranked by league position, then points, so with
+    several leagues in a tier the champions go up first.
+
+    Returns:
+        tuple: Boolean (runs, teams) arrays of the promoted and relegated slots.
+    """
+    promoted = np.zeros(positions.shape, dtype=bool)
+    relegated = np.zeros(positions.shape, dtype=bool)
+    tiebreak = rng.random(positions.shape)
+
+    tier_numbers = np.unique(tier_of_slot)
+    for upper, lower in zip(tier_numbers[:-1], tier_numbers[1:]):
+        upper_slots = np.flatnonzero(tier_of_slot == upper)
+        lower_slots = np.flatnonzero(tier_of_slot == lower)
+        # A team can't go up and down in the same season
+        moving = min(spots, len(upper_slots) // 2, len(lower_slots) // 2)
+        if moving == 0:
+            continue
+
+        for tier_slots, mask, best in [
+            (lower_slots, promoted, True),
+            (upper_slots, relegated, False),
+        ]:
+            order = np.lexsort(
+                (
+                    tiebreak[:, tier_slots],
+                    -tables["points"][:, tier_slots],
+                    positions[:, tier_slots],
+                ),
+                axis=-1,
+            )
+            chosen = order[:, :moving] if best else order[:, -moving:]
+            np.put_along_axis(mask, tier_slots[chosen], True, axis=1)
+
+    return promoted, relegated
+
+
+def move_teams(slot_team, promoted, relegated):
+    """
+    Swap the promoted and relegated teams: every promoted team takes the
+    league slot of a relegated team of the tier above, and the other way round.
+    The slots are paired in board order, which pairs the tiers from the top down.
+
+    Returns:
+        numpy.ndarray: The team in every slot for the next season.
+    """
+    moved = slot_team.copy()
+    runs = np.arange(len(slot_team))[:, np.newaxis]
+
+    # Both masks have the same number of slots per run and tier boundary
+    up_slots = np.nonzero(promoted)[1].reshape(len(slot_team), -1)
+    down_slots = np.nonzero(relegated)[1].reshape(len(slot_team), -1)
+
+    moved[runs, down_slots] = slot_team[runs, up_slots]
+    moved[runs, up_slots] = slot_team[runs, down_slots]
+
+    return moved
+
+
+def summarize_seasons(results, draft_board, years=1):
+    """
+    Summarize the simulated seasons per team.
+
+    Returns:
+        pandas.DataFrame: One row per team, in board order, with the league,
+            tier, average points, goal difference and position of the first
+            season, the share of titles, promotions and relegations, and with
+            more than one year the average final tier and the share of runs
+            the team ends in the top tier.
+    """
+    league_names = [
+        league_name
+        for league_name, number_of_teams, _ in draft_board["leagues"]
+        for _ in range(number_of_teams)
+    ]
+    tier_names = [tier_name for tier_name, _ in draft_board["tiers"]]
+    tier_numbers = [
+        tier_number
+        for _, number_of_teams, tier_number in draft_board["leagues"]
+        for _ in range(number_of_teams)
+    ]
+
+    summary = pd.DataFrame(
+        {
+            "League": league_names,
+            "Tier": [tier_names[tier_number] for tier_number in tier_numbers],
+            "Points": results["points"].mean(axis=0, dtype=np.float64),
+            "Goal Difference": results["goal_difference"].mean(
+                axis=0, dtype=np.float64
+            ),
+            "Position": results["position"].mean(axis=0) + 1,
+            "Title %": (results["position"] == 0).mean(axis=0) * 100,
+            "Promoted %": results["promoted"].mean(axis=0) * 100,
+            "Relegated %": results["relegated"].mean(axis=0) * 100,
+        },
+        index=pd.Index(draft_board["names"], name="Team"),
+    )
+
+    if years > 1:
+        summary["Final Tier"] = results["final_tier"].mean(axis=0) + 1
+        summary["Top Tier %"] = (results["final_tier"] == 0).mean(axis=0) * 100
+
+    # Leagues in board order, the teams of a league from the best average position
+    league_numbers = np.repeat(
+        np.arange(len(draft_board["leagues"])),
+        [number_of_teams for _, number_of_teams, _ in draft_board["leagues"]],
+    )
+    return summary.iloc[np.lexsort((summary["Position"], league_numbers))]
+
+
+def print_banner_simulation():
+    """
+    Print a banner for the season simulation.
+    """
+    width = 40
+
+    print("=" * width)
+    print("Simulate the leagues".center(width))
+    print("=" * width)
+
+
+if __name__ == "__main__":
+    # The command line of every part of the tool is in main.py
+    importlib.import_module("main").main(["simulate", *sys.argv[1:]])